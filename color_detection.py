@@ -1,6 +1,10 @@
 import cv2
 import pandas as pd
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'project'))
+from colorkit.names import ColorNameIndex
 
 
 image_path = r'C:\Users\Shahaan\Documents\ColorIdentification project\colorpic.jpg'
@@ -17,17 +21,11 @@ r = g = b = x_pos = y_pos = 0
 
 index = ["color", "color_name", "hex", "R", "G", "B"]
 csv = pd.read_csv(csv_path, names=index, header=None)
+color_index = ColorNameIndex.from_dataframe(csv)
 
 
 def get_color_name(R, G, B):
-    minimum = 10000
-    cname = ""
-    for i in range(len(csv)):
-        d = abs(R - int(csv.loc[i, "R"])) + abs(G - int(csv.loc[i, "G"])) + abs(B - int(csv.loc[i, "B"]))
-        if d < minimum:
-            minimum = d
-            cname = csv.loc[i, "color_name"]
-    return cname
+    return color_index.nearest(R, G, B)[0]
 
 
 def draw_function(event, x, y, flags, param):
@@ -4,8 +4,11 @@ import os
 import numpy as np
 from werkzeug.utils import secure_filename
 from PIL import Image
-from datetime import datetime
-import colorsys
+
+from color_pairs import find_indistinguishable_pairs
+from color_processing import SIMULATION_MODELS, SimulationPipeline, color_matrices
+from result_cache import ResultCache
+from storage_manager import UploadStorageManager
 
 # Create Flask app with explicit static folder configuration
 app = Flask(__name__, static_folder='static', static_url_path='/static')
@@ -24,56 +27,33 @@ if not os.path.exists(UPLOAD_FOLDER):
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 10 * 1024 * 1024  # Limit uploads to 10MB
 
-# Colorblindness simulation matrices
-color_matrices = {
-    'protanopia': np.array([
-        [0.567, 0.433, 0.000],
-        [0.558, 0.442, 0.000],
-        [0.000, 0.242, 0.758]
-    ]),
-    'deuteranopia': np.array([
-        [0.625, 0.375, 0.000],
-        [0.700, 0.300, 0.000],
-        [0.000, 0.300, 0.700]
-    ]),
-    'tritanopia': np.array([
-        [0.950, 0.050, 0.000],
-        [0.000, 0.433, 0.567],
-        [0.000, 0.475, 0.525]
-    ])
-}
+# Simulations and dominant colors run concurrently on a process pool.
+# SIMULATION_WORKERS=0 runs them in the request thread instead.
+simulation_pipeline = SimulationPipeline(
+    int(os.environ['SIMULATION_WORKERS']) if 'SIMULATION_WORKERS' in os.environ else None
+)
+
+# Uploads are stored and cached by content hash, so repeats reuse earlier results
+result_cache = ResultCache(UPLOAD_FOLDER)
+
+# Disk quota for the upload folder: least recently used files are deleted
+# once it is exceeded, and with UPLOAD_TTL_SECONDS also files idle that long
+upload_storage = UploadStorageManager(
+    UPLOAD_FOLDER,
+    max_bytes=int(os.environ.get('UPLOAD_QUOTA_BYTES', 1024 * 1024 * 1024)),
+    ttl=float(os.environ['UPLOAD_TTL_SECONDS']) if os.environ.get('UPLOAD_TTL_SECONDS') else None,
+    sweep_interval=float(os.environ.get('UPLOAD_SWEEP_INTERVAL', 60)),
+)
+upload_storage.start()
+
+# In lazy mode an upload only stores the original and computes its colors;
+# each simulation is rendered the first time its URL is requested.
+# The 'lazy' form field overrides this default per upload.
+LAZY_SIMULATIONS = os.environ.get('LAZY_SIMULATIONS', '0') == '1'
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def hex_to_rgb(hex_color):
-    hex_color = hex_color.lstrip('#')
-    return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
-
-def rgb_to_hex(rgb):
-    return f'#{int(rgb[0]):02x}{int(rgb[1]):02x}{int(rgb[2]):02x}'
-
-def extract_dominant_colors(image, n_colors=8):
-    small_image = image.resize((100, 100))
-    pixels = np.array(small_image).reshape(-1, 3)
-    pixels = (pixels // 16) * 16
-    unique_colors, counts = np.unique(pixels, axis=0, return_counts=True)
-    sorted_indices = np.argsort(-counts)
-    dominant_colors = unique_colors[sorted_indices][:n_colors]
-    hex_colors = [rgb_to_hex(color) for color in dominant_colors]
-    return hex_colors
-
-def suggest_alternative_colors(colors):
-    alternatives = {}
-    for color in colors:
-        rgb = hex_to_rgb(color)
-        h, l, s = colorsys.rgb_to_hls(rgb[0]/255, rgb[1]/255, rgb[2]/255)
-        new_h = (h + 0.5) % 1.0
-        new_r, new_g, new_b = colorsys.hls_to_rgb(new_h, l, s)
-        alt_color = rgb_to_hex((int(new_r*255), int(new_g*255), int(new_b*255)))
-        alternatives[color] = alt_color
-    return alternatives
-
 @app.route('/')
 def index():
     return send_from_directory('static', 'index.html')
@@ -84,8 +64,35 @@ def serve_static(filename):
 
 @app.route('/uploads/<path:filename>')
 def serve_upload_direct(filename):
+    if not upload_storage.touch(filename) and not result_cache.exists(filename):
+        render_simulation(filename)
     return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
 
+def render_simulation(filename):
+    """Render a simulation file on first request, if `filename` names one.
+
+    Does nothing for other names, or when the original is gone.
+    """
+    parsed = result_cache.parse_simulation_name(filename)
+    if parsed is None:
+        return
+    key, mode, ext, model, severity = parsed
+    if mode not in color_matrices or model not in SIMULATION_MODELS or severity > 1.0:
+        return
+    original_filename = result_cache.original_name(key, ext)
+    original_path = result_cache.path(original_filename)
+
+    def create(path):
+        image_np = np.array(Image.open(original_path).convert('RGB'))
+        simulation_pipeline.run(image_np, {mode: path}, model, severity, colors=False)
+
+    # The original must survive until the render has read it
+    with upload_storage.pinned([original_filename, filename]):
+        if not os.path.exists(original_path):
+            return
+        if result_cache.get_or_create(filename, create):
+            upload_storage.record_write(filename)
+
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
     if 'image' not in request.files:
@@ -95,63 +102,124 @@ def upload_file():
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
 
+    # 'srgb' (default) keeps the original matrices; 'machado' simulates in
+    # linear RGB with a 0-1 severity
+    model = request.form.get('model', 'srgb')
+    if model not in SIMULATION_MODELS:
+        return jsonify({'error': f"Unknown model '{model}'"}), 400
+    try:
+        severity = float(request.form.get('severity', 1.0))
+    except ValueError:
+        return jsonify({'error': 'severity must be a number'}), 400
+    if not 0.0 <= severity <= 1.0:
+        return jsonify({'error': 'severity must be between 0 and 1'}), 400
+    # Results are cached per whole percent of severity
+    severity = round(severity, 2)
+    lazy = request.form.get('lazy', '1' if LAZY_SIMULATIONS else '0') in ('1', 'true')
+
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        base_filename, ext = os.path.splitext(filename)
-
-        # Save original image
-        original_filename = f"{base_filename}_original_{timestamp}{ext}"
-        original_path = os.path.join(app.config['UPLOAD_FOLDER'], original_filename)
-        file.save(original_path)
-        
-        try:
-            pil_image = Image.open(original_path).convert('RGB')
-            image_np = np.array(pil_image).astype(float) / 255.0
-
-            # Extract dominant colors and suggestions
-            dominant_colors = extract_dominant_colors(pil_image)
-            suggested_colors = suggest_alternative_colors(dominant_colors)
-
-            # Use direct path to image
-            results = {
-                'originalImage': f"/uploads/{original_filename}",
-                'simulations': {},
-                'dominantColors': dominant_colors,
-                'suggestedColors': suggested_colors
-            }
-
-            for mode, matrix in color_matrices.items():
-                reshaped = image_np.reshape(-1, 3)
-                transformed = reshaped @ matrix.T
-                transformed = np.clip(transformed, 0, 1)
-                transformed_img = (transformed.reshape(image_np.shape) * 255).astype(np.uint8)
-
-                simulated_pil = Image.fromarray(transformed_img)
-                simulated_filename = f"{base_filename}_{mode}_simulated_{timestamp}{ext}"
-                simulated_path = os.path.join(app.config['UPLOAD_FOLDER'], simulated_filename)
-                simulated_pil.save(simulated_path)
-                
-                # Use direct path for simulations
-                results['simulations'][mode] = f"/uploads/{simulated_filename}"
-
-            # Print paths for debugging
-            print(f"Original image path: {original_path}")
-            print(f"Original image URL: {results['originalImage']}")
-            for mode, url in results['simulations'].items():
-                print(f"{mode} simulation URL: {url}")
+        ext = os.path.splitext(filename)[1].lower()
+        data = file.read()
+        key = result_cache.key(data)
+
+        original_filename = result_cache.original_name(key, ext)
+        simulated_filenames = {mode: result_cache.simulation_name(key, mode, ext, model, severity)
+                               for mode in color_matrices}
+        upload_files = [original_filename, result_cache.colors_name(key), *simulated_filenames.values()]
+
+        # Nothing this upload writes or reads may be evicted before the
+        # response is built, even with a quota smaller than the upload
+        with upload_storage.pinned(upload_files):
+            # Save original image, unless the same bytes were uploaded before
+            result_cache.store_original(key, ext, data)
+            original_path = result_cache.path(original_filename)
+
+            try:
+                outputs = {mode: result_cache.path(name) for mode, name in simulated_filenames.items()
+                           if not lazy and not result_cache.exists(name)}
+
+                # Only decode and compute what is not already cached for this content
+                cached_colors = result_cache.get_colors(key)
+                if outputs or cached_colors is None:
+                    image_np = np.array(Image.open(original_path).convert('RGB'))
+                    # Extract dominant colors and suggestions alongside the simulations
+                    colors = simulation_pipeline.run(image_np, outputs, model, severity,
+                                                     colors=cached_colors is None)
+                    if cached_colors is None:
+                        result_cache.put_colors(key, *colors)
+                        cached_colors = colors
+                dominant_colors, suggested_colors = cached_colors
+
+                # Lazily rendered simulations are recorded when they are first served
+                upload_storage.record_write(*upload_files)
+
+                # Use direct path to image
+                results = {
+                    'originalImage': f"/uploads/{original_filename}",
+                    'simulations': {},
+                    'model': model,
+                    'severity': severity,
+                    'lazy': lazy,
+                    'dominantColors': dominant_colors,
+                    'suggestedColors': suggested_colors
+                }
+
+                for mode, simulated_filename in simulated_filenames.items():
+                    # Use direct path for simulations
+                    results['simulations'][mode] = f"/uploads/{simulated_filename}"
+
+                # Print paths for debugging
+                print(f"Original image path: {original_path}")
+                print(f"Original image URL: {results['originalImage']}")
+                for mode, url in results['simulations'].items():
+                    print(f"{mode} simulation URL: {url}")
+                    
+                return jsonify(results)
                 
-            return jsonify(results)
-            
-        except Exception as e:
-            print(f"Error processing image: {str(e)}")
-            return jsonify({'error': f'Error processing image: {str(e)}'}), 500
+            except Exception as e:
+                print(f"Error processing image: {str(e)}")
+                return jsonify({'error': f'Error processing image: {str(e)}'}), 500
 
     return jsonify({'error': 'File type not allowed'}), 400
 
+@app.route('/api/indistinguishable-colors', methods=['POST'])
+def indistinguishable_colors():
+    """Pairs of colors in an image closer than a CIEDE2000 threshold.
+
+    Takes a new 'image' file, or the 'filename' of an earlier upload.
+    Optional form fields: threshold, bits, min_fraction, max_pairs.
+    """
+    try:
+        threshold = float(request.form.get('threshold', 10))
+        bits = int(request.form.get('bits', 4))
+        min_fraction = float(request.form.get('min_fraction', 0.001))
+        max_pairs = int(request.form.get('max_pairs', 100))
+    except ValueError:
+        return jsonify({'error': 'Invalid numeric parameter'}), 400
+    if threshold <= 0 or not 1 <= bits <= 6 or min_fraction < 0 or max_pairs < 0:
+        return jsonify({'error': 'Parameter out of range'}), 400
+
+    if 'image' in request.files and request.files['image'].filename:
+        source = request.files['image']
+    elif request.form.get('filename'):
+        source = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(request.form['filename']))
+        if not os.path.exists(source):
+            return jsonify({'error': 'File not found'}), 404
+        upload_storage.touch(os.path.basename(source))
+    else:
+        return jsonify({'error': 'No image or filename given'}), 400
+
+    try:
+        image_np = np.array(Image.open(source).convert('RGB'))
+    except Exception as e:
+        return jsonify({'error': f'Error reading image: {str(e)}'}), 400
+    return jsonify(find_indistinguishable_pairs(image_np, threshold, bits, min_fraction, max_pairs=max_pairs))
+
 # Debug route to check if files exist
 @app.route('/api/check-file/<path:filename>')
 def check_file(filename):
+    upload_storage.touch(filename)
     filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
     if os.path.exists(filepath):
         return jsonify({
@@ -165,9 +233,13 @@ def check_file(filename):
             'searched_path': os.path.abspath(filepath)
         }), 404
 
+@app.route('/api/storage-stats')
+def storage_stats():
+    return jsonify(upload_storage.stats())
+
 if __name__ == '__main__':
     # Print important paths for debugging
     print(f"Current working directory: {os.getcwd()}")
     print(f"Static folder path: {app.static_folder}")
     print(f"Upload folder path: {app.config['UPLOAD_FOLDER']}")
-    app.run(debug=True, host='0.0.0.0', port=5002)
\ No newline at end of file
+    app.run(debug=True, host='0.0.0.0', port=5002)
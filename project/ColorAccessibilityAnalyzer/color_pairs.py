@@ -0,0 +1,98 @@
+import os
+import sys
+
+import numpy as np
+from sklearn.neighbors import KDTree
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from colorkit.delta_e import ciede2000
+from colorkit.lab import srgb_to_lab
+from colorkit.palette import unique_colors
+from color_processing import rgb_to_hex, sample_pixels
+
+# CIEDE2000 distance under which two colors count as indistinguishable,
+# the same threshold test.py used
+DELTA_THRESHOLD = 10
+
+# Bits per channel kept when deduplicating colors (4096 possible bins)
+PAIR_BITS = 4
+
+# Bins holding less than this share of the sampled pixels are ignored
+MIN_FRACTION = 0.001
+
+# Longest side of the sampled image
+PAIR_SAMPLE_SIZE = 512
+
+# CIEDE2000 divides chroma differences by up to 1 + 0.045 * C' (C' <= 1.5 C)
+# and lightness differences by up to 1.75. The RT term in the blue region
+# can shrink the distance by a further ~20%, which _PREFILTER_MARGIN covers
+# with room to spare. Together they give each color a Lab (CIE76) radius
+# outside of which no CIEDE2000-close partner can lie.
+_MAX_S_L = 1.75
+_PREFILTER_MARGIN = 1.5
+
+
+def prefilter_radius(lab, threshold):
+    chroma = np.hypot(lab[:, 1], lab[:, 2])
+    return threshold * _PREFILTER_MARGIN * np.maximum(_MAX_S_L, 1 + 0.045 * 1.5 * chroma)
+
+
+def candidate_pairs(lab, threshold):
+    """Index pairs (i, j), i != j, that may be within `threshold` CIEDE2000.
+
+    A KD-tree on Lab is queried with each color's prefilter radius. A pair
+    is kept from the side with the larger chroma, since that side's
+    radius bounds the pair, so every pair appears once.
+    """
+    if len(lab) < 2:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    radius = prefilter_radius(lab, threshold)
+    neighbors = KDTree(lab).query_radius(lab, r=radius)
+    counts = np.fromiter((len(n) for n in neighbors), dtype=np.intp, count=len(lab))
+    first = np.repeat(np.arange(len(lab)), counts)
+    second = np.concatenate(neighbors).astype(np.intp)
+    # Larger radius wins, ties broken by index
+    keep = (radius[second] < radius[first]) | ((radius[second] == radius[first]) & (second > first))
+    return first[keep], second[keep]
+
+
+def find_indistinguishable_pairs(image_np, threshold=DELTA_THRESHOLD, bits=PAIR_BITS,
+                                 min_fraction=MIN_FRACTION, sample_size=PAIR_SAMPLE_SIZE,
+                                 max_pairs=100):
+    """Color pairs in an RGB image closer than `threshold` CIEDE2000.
+
+    Pixels are taken with sample_pixels(). They are quantized
+    to `bits` per channel, binned, and each bin is represented by its mean
+    color. Bins under `min_fraction` of the pixels are dropped. The
+    remaining colors go through the KD-tree prefilter, and every candidate
+    pair gets an exact CIEDE2000 check. Pairs are ranked by the share of
+    the less common color, so pairs that both cover real area come first.
+    """
+    pixels = sample_pixels(np.asarray(image_np), sample_size)
+    colors, counts = unique_colors(pixels, bits)
+    fractions = counts / counts.sum()
+    keep = fractions >= min_fraction
+    colors, fractions = colors[keep], fractions[keep]
+
+    lab = srgb_to_lab(colors)
+    first, second = candidate_pairs(lab, threshold)
+    delta = ciede2000(lab[first], lab[second])
+    close = delta < threshold
+    first, second, delta = first[close], second[close], delta[close]
+
+    weight = np.minimum(fractions[first], fractions[second])
+    order = np.argsort(-weight, kind='stable')[:max_pairs]
+    hex_colors = [rgb_to_hex(c) for c in np.round(colors)]
+    pairs = [{
+        'color1': hex_colors[first[k]],
+        'color2': hex_colors[second[k]],
+        'deltaE': round(float(delta[k]), 2),
+        'fraction1': round(float(fractions[first[k]]), 4),
+        'fraction2': round(float(fractions[second[k]]), 4),
+    } for k in order]
+    return {
+        'threshold': threshold,
+        'colorCount': len(colors),
+        'pairCount': int(close.sum()),
+        'pairs': pairs,
+    }
@@ -0,0 +1,410 @@
+import colorsys
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from colorkit.atomic import atomic_write
+from colorkit.delta_e import pairwise
+from colorkit.lab import srgb_to_lab
+from colorkit.palette import unique_colors
+
+# Bump when simulated output or dominant-color results change, so cached
+# results from older versions are not reused
+SIMULATION_VERSION = 2
+DOMINANT_COLORS_VERSION = 2
+
+# Dominant colors: bits kept per channel, longest side of the sampled
+# image, and the color difference (colorkit.delta_e metric) under which
+# bins are merged (None = off)
+DOMINANT_BITS = 4
+DOMINANT_SAMPLE_SIZE = 256
+DOMINANT_MERGE_DELTA_E = 10.0
+DOMINANT_MERGE_METRIC = 'cie76'
+
+# Only the most populated bins take part in the merge; the rest hold too
+# few pixels to change the ranking
+MERGE_CANDIDATES = 256
+
+# Colorblindness simulation matrices
+color_matrices = {
+    'protanopia': np.array([
+        [0.567, 0.433, 0.000],
+        [0.558, 0.442, 0.000],
+        [0.000, 0.242, 0.758]
+    ]),
+    'deuteranopia': np.array([
+        [0.625, 0.375, 0.000],
+        [0.700, 0.300, 0.000],
+        [0.000, 0.300, 0.700]
+    ]),
+    'tritanopia': np.array([
+        [0.950, 0.050, 0.000],
+        [0.000, 0.433, 0.567],
+        [0.000, 0.475, 0.525]
+    ])
+}
+
+# Machado, Oliveira & Fernandes (2009) simulation matrices for linear RGB,
+# tabulated at severities 0.0, 0.1, ..., 1.0 (0.0 is the identity)
+MACHADO_MATRICES = {
+    'protanopia': [
+        [[1.000000, 0.000000, 0.000000], [0.000000, 1.000000, 0.000000], [0.000000, 0.000000, 1.000000]],
+        [[0.856167, 0.182038, -0.038205], [0.029342, 0.955115, 0.015544], [-0.002880, -0.001563, 1.004443]],
+        [[0.734766, 0.334872, -0.069637], [0.051840, 0.919198, 0.028963], [-0.004928, -0.004209, 1.009137]],
+        [[0.630323, 0.465641, -0.095964], [0.069181, 0.890046, 0.040773], [-0.006308, -0.007724, 1.014032]],
+        [[0.539009, 0.579343, -0.118352], [0.082546, 0.866121, 0.051332], [-0.007136, -0.011959, 1.019095]],
+        [[0.458064, 0.679578, -0.137642], [0.092785, 0.846313, 0.060902], [-0.007494, -0.016807, 1.024301]],
+        [[0.385450, 0.769005, -0.154455], [0.100526, 0.829802, 0.069673], [-0.007442, -0.022190, 1.029632]],
+        [[0.319627, 0.849633, -0.169261], [0.106241, 0.815969, 0.077790], [-0.007025, -0.028051, 1.035076]],
+        [[0.259411, 0.923008, -0.182420], [0.110296, 0.804340, 0.085364], [-0.006276, -0.034346, 1.040622]],
+        [[0.203876, 0.990338, -0.194214], [0.112975, 0.794542, 0.092483], [-0.005222, -0.041043, 1.046265]],
+        [[0.152286, 1.052583, -0.204868], [0.114503, 0.786281, 0.099216], [-0.003882, -0.048116, 1.051998]],
+    ],
+    'deuteranopia': [
+        [[1.000000, 0.000000, 0.000000], [0.000000, 1.000000, 0.000000], [0.000000, 0.000000, 1.000000]],
+        [[0.866435, 0.177704, -0.044139], [0.049567, 0.939063, 0.011370], [-0.003453, 0.007233, 0.996220]],
+        [[0.760729, 0.319078, -0.079807], [0.090568, 0.889315, 0.020117], [-0.006027, 0.013325, 0.992702]],
+        [[0.675425, 0.433850, -0.109275], [0.125303, 0.847755, 0.026942], [-0.007950, 0.018572, 0.989378]],
+        [[0.605511, 0.528560, -0.134071], [0.155318, 0.812366, 0.032316], [-0.009376, 0.023176, 0.986200]],
+        [[0.547494, 0.607765, -0.155259], [0.181692, 0.781742, 0.036566], [-0.010410, 0.027275, 0.983136]],
+        [[0.498864, 0.674741, -0.173604], [0.205199, 0.754872, 0.039929], [-0.011131, 0.030969, 0.980162]],
+        [[0.457771, 0.731899, -0.189670], [0.226409, 0.731012, 0.042579], [-0.011595, 0.034333, 0.977261]],
+        [[0.422823, 0.781057, -0.203881], [0.245752, 0.709602, 0.044646], [-0.011843, 0.037423, 0.974421]],
+        [[0.392952, 0.823610, -0.216562], [0.263559, 0.690210, 0.046232], [-0.011910, 0.040281, 0.971630]],
+        [[0.367322, 0.860646, -0.227968], [0.280085, 0.672501, 0.047413], [-0.011820, 0.042940, 0.968881]],
+    ],
+    'tritanopia': [
+        [[1.000000, 0.000000, 0.000000], [0.000000, 1.000000, 0.000000], [0.000000, 0.000000, 1.000000]],
+        [[0.926670, 0.092514, -0.019184], [0.021191, 0.964503, 0.014306], [0.008437, 0.054813, 0.936750]],
+        [[0.895720, 0.133330, -0.029050], [0.029997, 0.945400, 0.024603], [0.013027, 0.104707, 0.882266]],
+        [[0.905871, 0.127791, -0.033662], [0.026856, 0.941251, 0.031893], [0.013410, 0.148296, 0.838294]],
+        [[0.948035, 0.089490, -0.037526], [0.014364, 0.946792, 0.038844], [0.010853, 0.193991, 0.795156]],
+        [[1.017277, 0.027029, -0.044306], [-0.006113, 0.958479, 0.047634], [0.006379, 0.248708, 0.744913]],
+        [[1.104996, -0.046633, -0.058363], [-0.032137, 0.971635, 0.060503], [0.001336, 0.317922, 0.680742]],
+        [[1.193214, -0.109812, -0.083402], [-0.058496, 0.979410, 0.079086], [-0.002346, 0.403492, 0.598854]],
+        [[1.257728, -0.139648, -0.118081], [-0.078003, 0.975409, 0.102594], [-0.003316, 0.501214, 0.502102]],
+        [[1.278864, -0.125333, -0.153531], [-0.084748, 0.957674, 0.127074], [-0.000989, 0.601151, 0.399838]],
+        [[1.255528, -0.076749, -0.178779], [-0.078411, 0.930809, 0.147602], [0.004733, 0.691367, 0.303900]],
+    ],
+}
+
+# Simulation models: 'srgb' applies color_matrices to gamma-encoded values
+# (the original behaviour), 'machado' applies MACHADO_MATRICES in linear RGB
+SIMULATION_MODELS = ('srgb', 'machado')
+
+# Entries in the linear -> sRGB encode table. At 16384 steps one step is
+# under a quarter of an 8-bit level even on the steep segment near black.
+ENCODE_STEPS = 16384
+
+def _srgb_to_linear(v):
+    return np.where(v <= 0.04045, v / 12.92, ((v + 0.055) / 1.055) ** 2.4)
+
+def _linear_to_srgb(v):
+    return np.where(v <= 0.0031308, 12.92 * v, 1.055 * np.power(v, 1 / 2.4) - 0.055)
+
+# uint8 sRGB -> linear float32, and quantized linear -> uint8 sRGB
+SRGB_DECODE = _srgb_to_linear(np.arange(256) / 255.0).astype(np.float32)
+SRGB_ENCODE = np.round(_linear_to_srgb(np.arange(ENCODE_STEPS) / (ENCODE_STEPS - 1)) * 255).astype(np.uint8)
+
+def machado_matrix(mode, severity):
+    """Linear-RGB matrix for `mode` at a severity in [0, 1].
+
+    Severities between the tabulated steps are interpolated linearly.
+    """
+    if not 0.0 <= severity <= 1.0:
+        raise ValueError("severity must be between 0 and 1")
+    table = MACHADO_MATRICES[mode]
+    pos = severity * (len(table) - 1)
+    lo = min(int(pos), len(table) - 2)
+    frac = pos - lo
+    return (1 - frac) * np.array(table[lo]) + frac * np.array(table[lo + 1])
+
+def simulation_matrices(model='srgb', severity=1.0):
+    """Return ({mode: 3x3 matrix}, linear) for a simulation model."""
+    if model == 'srgb':
+        return dict(color_matrices), False
+    if model == 'machado':
+        return {mode: machado_matrix(mode, severity) for mode in MACHADO_MATRICES}, True
+    raise ValueError(f"unknown simulation model '{model}'")
+
+def hex_to_rgb(hex_color):
+    hex_color = hex_color.lstrip('#')
+    return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+
+def rgb_to_hex(rgb):
+    return f'#{int(rgb[0]):02x}{int(rgb[1]):02x}{int(rgb[2]):02x}'
+
+def sample_pixels(image_np, sample_size=DOMINANT_SAMPLE_SIZE):
+    """Every n-th pixel in both directions, so the longest side is at most
+    `sample_size`. Keeps the aspect ratio and never blends colors."""
+    step = max(1, -(-max(image_np.shape[:2]) // sample_size))
+    return image_np[::step, ::step].reshape(-1, 3)
+
+def merge_similar_colors(colors, counts, max_delta_e, metric=DOMINANT_MERGE_METRIC):
+    """Merge bins closer than `max_delta_e` to a more common bin.
+
+    Bins are visited from most to least common. Each unmerged bin absorbs
+    every unmerged bin within range, and the merged color is the
+    count-weighted mean. Returns (colors, counts) sorted by count.
+    """
+    order = np.argsort(-counts, kind='stable')
+    colors, counts = colors[order], counts[order]
+    lab = srgb_to_lab(colors)
+    close = pairwise(lab, lab, metric) <= max_delta_e
+
+    group = np.full(len(colors), -1)
+    n_groups = 0
+    for i in range(len(colors)):
+        if group[i] < 0:
+            group[close[i] & (group < 0)] = n_groups
+            n_groups += 1
+
+    merged_counts = np.bincount(group, weights=counts, minlength=n_groups)
+    merged = np.stack([np.bincount(group, weights=counts * colors[:, c], minlength=n_groups) for c in range(3)], axis=1)
+    merged /= merged_counts[:, None]
+    order = np.argsort(-merged_counts, kind='stable')
+    return merged[order], merged_counts[order]
+
+def extract_dominant_colors(image, n_colors=8, bits=DOMINANT_BITS, sample_size=DOMINANT_SAMPLE_SIZE,
+                            merge_delta_e=DOMINANT_MERGE_DELTA_E, merge_metric=DOMINANT_MERGE_METRIC):
+    """Most common colors of a PIL image or RGB array, as hex strings.
+
+    Sampled pixels are quantized to `bits` per channel and counted with one
+    bincount over packed RGB keys. Each bin's color is the mean of its
+    pixels. With `merge_delta_e`, near-identical bins are merged in Lab
+    space first, so one gradient does not fill several slots.
+    """
+    pixels = sample_pixels(np.asarray(image), sample_size)
+    colors, counts = unique_colors(pixels, bits)
+    order = np.argsort(-counts, kind='stable')
+    colors, counts = colors[order], counts[order]
+    if merge_delta_e:
+        colors, counts = merge_similar_colors(colors[:MERGE_CANDIDATES], counts[:MERGE_CANDIDATES],
+                                              merge_delta_e, merge_metric)
+    return [rgb_to_hex(color) for color in np.round(colors[:n_colors])]
+
+def suggest_alternative_colors(colors):
+    alternatives = {}
+    for color in colors:
+        rgb = hex_to_rgb(color)
+        h, l, s = colorsys.rgb_to_hls(rgb[0]/255, rgb[1]/255, rgb[2]/255)
+        new_h = (h + 0.5) % 1.0
+        new_r, new_g, new_b = colorsys.hls_to_rgb(new_h, l, s)
+        alt_color = rgb_to_hex((int(new_r*255), int(new_g*255), int(new_b*255)))
+        alternatives[color] = alt_color
+    return alternatives
+
+def analyze_colors(image_np):
+    """Return (dominant_colors, suggested_colors) for an RGB array."""
+    dominant_colors = extract_dominant_colors(image_np)
+    return dominant_colors, suggest_alternative_colors(dominant_colors)
+
+def simulate(image_np, matrix):
+    """Apply a simulation matrix to an (H, W, 3) uint8 RGB image.
+
+    Straightforward float64 reference; FusedSimulator is the fast path.
+    """
+    normalized = image_np.astype(float) / 255.0
+    reshaped = normalized.reshape(-1, 3)
+    transformed = reshaped @ matrix.T
+    transformed = np.clip(transformed, 0, 1)
+    return (transformed.reshape(image_np.shape) * 255).astype(np.uint8)
+
+def simulate_linear(image_np, matrix):
+    """Float64 reference for a linear-RGB matrix, with exact sRGB curves."""
+    linear = _srgb_to_linear(image_np.reshape(-1, 3) / 255.0)
+    transformed = np.clip(linear @ np.asarray(matrix).T, 0, 1)
+    return np.round(_linear_to_srgb(transformed) * 255).astype(np.uint8).reshape(image_np.shape)
+
+
+# Fixed-point scale for FusedSimulator(precision='fixed')
+FIXED_POINT_BITS = 16
+
+# Pixels per tile, sized so a tile's inputs and all modes' results stay
+# in cache
+TILE_PIXELS = 16384
+
+
+class FusedSimulator:
+    """All simulation modes in one pass over the image.
+
+    The per-mode 3x3 matrices are stacked into one 3 x (3*k) matrix, so every
+    tile of pixels is multiplied once for all k modes. Work is done tile by
+    tile in float32 (or int32 fixed point with precision='fixed'), and the
+    results go straight into preallocated uint8 outputs. Peak extra memory is
+    one tile's worth instead of several full-image float64 buffers per mode.
+
+    With linear=True the matrices act on linear RGB. Pixels are decoded
+    through the 256-entry SRGB_DECODE table and re-encoded through
+    SRGB_ENCODE, so no per-pixel power functions are evaluated.
+    """
+
+    def __init__(self, matrices, precision='float32', linear=False):
+        if precision not in ('float32', 'fixed'):
+            raise ValueError("precision must be 'float32' or 'fixed'")
+        if linear and precision != 'float32':
+            raise ValueError("linear simulation requires precision='float32'")
+        self.modes = list(matrices)
+        self.precision = precision
+        self.linear = linear
+        # Pixel values stay in 0..255, so x @ M.T is already the output scale
+        stacked = np.concatenate([np.asarray(matrices[m], dtype=np.float64).T for m in self.modes]
+                                 or [np.empty((3, 0))], axis=1)
+        if precision == 'fixed':
+            self.matrix = np.round(stacked * (1 << FIXED_POINT_BITS)).astype(np.int32)
+        else:
+            self.matrix = stacked.astype(np.float32)
+
+    def allocate(self, shape):
+        return {mode: np.empty(shape, dtype=np.uint8) for mode in self.modes}
+
+    def run(self, image_np, outputs=None, row_start=0, row_stop=None):
+        """Fill `outputs` ({mode: uint8 array like image_np}) for a row range.
+
+        Allocates the outputs when none are given and returns them.
+        """
+        if outputs is None:
+            outputs = self.allocate(image_np.shape)
+        if not self.modes:
+            return outputs
+        row_stop = image_np.shape[0] if row_stop is None else row_stop
+        width = image_np.shape[1]
+        rows_per_tile = max(1, TILE_PIXELS // max(1, width))
+        work_dtype = np.int32 if self.precision == 'fixed' else np.float32
+        flat_out = [outputs[mode].reshape(-1, 3) for mode in self.modes]
+
+        for r0 in range(row_start, row_stop, rows_per_tile):
+            r1 = min(r0 + rows_per_tile, row_stop)
+            if self.linear:
+                acc = np.take(SRGB_DECODE, image_np[r0:r1].reshape(-1, 3)) @ self.matrix
+                np.clip(acc, 0, 1, out=acc)
+                acc *= ENCODE_STEPS - 1
+                acc += 0.5
+                acc = np.take(SRGB_ENCODE, acc.astype(np.intp))
+            else:
+                tile = image_np[r0:r1].reshape(-1, 3).astype(work_dtype)
+                acc = tile @ self.matrix
+                if self.precision == 'fixed':
+                    acc >>= FIXED_POINT_BITS
+                np.clip(acc, 0, 255, out=acc)
+            p0, p1 = r0 * width, r1 * width
+            for i, out in enumerate(flat_out):
+                out[p0:p1] = acc[:, 3 * i:3 * i + 3]
+        return outputs
+
+
+def save_image(image_np, path):
+    """Encode to `path` via a temporary file, so readers never see a partial image."""
+    root, ext = os.path.splitext(path)
+    fmt = Image.registered_extensions().get(ext.lower())
+    with atomic_write(path) as f:
+        Image.fromarray(image_np).save(f, format=fmt)
+
+
+# ---- Worker side: everything below runs in pool processes ----
+
+def _attach(shm_name, shape):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    return shm, np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+
+def _simulate_band(in_name, out_name, shape, matrices, linear, row_start, row_stop):
+    in_shm, image_np = _attach(in_name, shape)
+    out_shm, out_np = _attach(out_name, (len(matrices),) + tuple(shape))
+    try:
+        simulator = FusedSimulator(matrices, linear=linear)
+        simulator.run(image_np, dict(zip(matrices, out_np)), row_start, row_stop)
+    finally:
+        del image_np, out_np
+        in_shm.close()
+        out_shm.close()
+
+def _save_output(out_name, shape, n_modes, index, output_path):
+    shm, out_np = _attach(out_name, (n_modes,) + tuple(shape))
+    try:
+        save_image(out_np[index], output_path)
+    finally:
+        del out_np
+        shm.close()
+    return output_path
+
+def _dominant_colors(shm_name, shape):
+    shm, image_np = _attach(shm_name, shape)
+    try:
+        return analyze_colors(image_np)
+    finally:
+        del image_np
+        shm.close()
+
+
+class SimulationPipeline:
+    """Runs every simulation plus dominant-color extraction concurrently.
+
+    The decoded image is copied once into a shared-memory block, and the
+    simulated images are written into a second one. Pool workers map both
+    by name, so only names, shapes and row ranges are pickled. Workers first
+    run FusedSimulator over horizontal bands of the image. Then one task per
+    mode encodes and saves its output, alongside the dominant-color task.
+    With workers=0 everything runs in-process.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = os.cpu_count() if workers is None else workers
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def run(self, image_np, outputs, model='srgb', severity=1.0, colors=True):
+        """Render `outputs` ({mode: path}) and extract dominant colors.
+
+        `model` and `severity` are as for simulation_matrices(). Returns
+        (dominant_colors, suggested_colors), or None when colors=False.
+        """
+        image_np = np.ascontiguousarray(image_np, dtype=np.uint8)
+        modes = list(outputs)
+        all_matrices, linear = simulation_matrices(model, severity)
+        matrices = {mode: all_matrices[mode] for mode in modes}
+        # Every simulation cached, e.g. after a DOMINANT_COLORS_VERSION bump
+        if not modes:
+            return analyze_colors(image_np) if colors else None
+        if not self.workers:
+            simulator = FusedSimulator(matrices, linear=linear)
+            for mode, simulated in simulator.run(image_np).items():
+                save_image(simulated, outputs[mode])
+            return analyze_colors(image_np) if colors else None
+
+        shape = image_np.shape
+        in_shm = shared_memory.SharedMemory(create=True, size=image_np.nbytes)
+        out_shm = shared_memory.SharedMemory(create=True, size=image_np.nbytes * len(modes))
+        try:
+            np.ndarray(shape, dtype=np.uint8, buffer=in_shm.buf)[:] = image_np
+            pool = self._get_pool()
+            colors_future = pool.submit(_dominant_colors, in_shm.name, shape) if colors else None
+
+            band = -(-shape[0] // self.workers)
+            bands = [pool.submit(_simulate_band, in_shm.name, out_shm.name, shape, matrices, linear, r0, min(r0 + band, shape[0]))
+                     for r0 in range(0, shape[0], band)]
+            for future in bands:
+                future.result()
+
+            saves = [pool.submit(_save_output, out_shm.name, shape, len(modes), i, outputs[mode])
+                     for i, mode in enumerate(modes)]
+            for future in saves:
+                future.result()
+            return colors_future.result() if colors else None
+        finally:
+            for shm in (in_shm, out_shm):
+                shm.close()
+                shm.unlink()
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from concurrent.futures import Future
+
+from color_processing import DOMINANT_COLORS_VERSION, SIMULATION_VERSION
+from colorkit.atomic import write_atomic
+
+# Hex digits of the sha256 used in file names
+KEY_LENGTH = 24
+
+# <key>_<mode>[_<model><severity percent>]_simulated_v<version><ext>
+_SIMULATION_NAME = re.compile(
+    r'^([0-9a-f]{%d})_([a-z]+?)(?:_([a-z]+)(\d{1,3}))?_simulated_v(\d+)(\.[a-z]+)$' % KEY_LENGTH
+)
+
+
+class ResultCache:
+    """Content-addressed upload results in the upload folder.
+
+    Files are named after the sha256 of the uploaded bytes instead of a
+    timestamp, so uploading the same image twice reuses the original and
+    every simulation already rendered for it. Simulation names carry
+    SIMULATION_VERSION, and dominant colors are kept as JSON under
+    .results/ with DOMINANT_COLORS_VERSION, so changing either algorithm
+    invalidates only its own entries.
+    """
+
+    def __init__(self, upload_dir):
+        self.upload_dir = upload_dir
+        self.results_dir = os.path.join(upload_dir, '.results')
+        os.makedirs(self.results_dir, exist_ok=True)
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+
+    @staticmethod
+    def key(data):
+        return hashlib.sha256(data).hexdigest()[:KEY_LENGTH]
+
+    @staticmethod
+    def original_name(key, ext):
+        return f"{key}_original{ext}"
+
+    @staticmethod
+    def simulation_name(key, mode, ext, model='srgb', severity=1.0):
+        variant = '' if model == 'srgb' else f"_{model}{int(severity * 100 + 0.5)}"
+        return f"{key}_{mode}{variant}_simulated_v{SIMULATION_VERSION}{ext}"
+
+    @staticmethod
+    def parse_simulation_name(name):
+        """Inverse of simulation_name(): (key, mode, ext, model, severity).
+
+        Returns None for other files, for names from older versions and for
+        names simulation_name() would not produce (an srgb severity suffix,
+        zero-padded severities), so one simulation has exactly one name.
+        """
+        match = _SIMULATION_NAME.match(name)
+        if match is None or int(match.group(5)) != SIMULATION_VERSION:
+            return None
+        key, mode, model, percent, _, ext = match.groups()
+        if model is None:
+            model, severity = 'srgb', 1.0
+        elif model == 'srgb':
+            return None
+        else:
+            severity = int(percent) / 100
+        if ResultCache.simulation_name(key, mode, ext, model, severity) != name:
+            return None
+        return key, mode, ext, model, severity
+
+    def path(self, name):
+        return os.path.join(self.upload_dir, name)
+
+    def exists(self, name):
+        return os.path.exists(self.path(name))
+
+    def get_or_create(self, name, create):
+        """Make sure `name` exists, calling create(path) if it does not.
+
+        Concurrent calls for the same missing file share a single create()
+        call; the others wait for it and see the same result or exception.
+        Returns True if this call (or the one it waited on) created the file.
+        """
+        if self.exists(name):
+            return False
+        with self._pending_lock:
+            future = self._pending.get(name)
+            owner = future is None
+            if owner:
+                future = self._pending[name] = Future()
+        if not owner:
+            return future.result()
+
+        try:
+            # Another request may have finished it between the checks above
+            created = not self.exists(name)
+            if created:
+                create(self.path(name))
+            future.set_result(created)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._pending_lock:
+                del self._pending[name]
+        return created
+
+    def store_original(self, key, ext, data):
+        """Write the upload unless identical bytes are already stored."""
+        name = self.original_name(key, ext)
+        if not self.exists(name):
+            write_atomic(self.path(name), data)
+        return name
+
+    @staticmethod
+    def colors_name(key):
+        return os.path.join('.results', f"{key}_colors_v{DOMINANT_COLORS_VERSION}.json")
+
+    def _colors_path(self, key):
+        return self.path(self.colors_name(key))
+
+    def get_colors(self, key):
+        """Return cached (dominant_colors, suggested_colors), or None."""
+        try:
+            with open(self._colors_path(key)) as f:
+                record = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        return record['dominantColors'], record['suggestedColors']
+
+    def put_colors(self, key, dominant_colors, suggested_colors):
+        record = {'dominantColors': dominant_colors, 'suggestedColors': suggested_colors}
+        write_atomic(self._colors_path(key), json.dumps(record).encode())
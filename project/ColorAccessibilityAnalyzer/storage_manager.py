@@ -0,0 +1,175 @@
+import collections
+import contextlib
+import os
+import threading
+import time
+
+
+class UploadStorageManager:
+    """Keeps the upload folder under a byte quota.
+
+    Every file below `directory` is tracked with its size and last access
+    time. Once the total goes over `max_bytes`, the least recently used
+    files are deleted. With a `ttl`, files not accessed for that many
+    seconds are deleted as well. The app reports reads through touch() and
+    new files through record_write(). A background thread calls sweep()
+    every `sweep_interval` seconds. Each sweep rescans the directory, so
+    files written by other processes are picked up too. Files inside a
+    pinned() block are never evicted, so a request can finish writing and
+    reading its own files.
+    """
+
+    def __init__(self, directory, max_bytes, ttl=None, sweep_interval=60):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.evicted_bytes = 0
+        self.last_sweep = None
+        self._files = collections.OrderedDict()  # relative path -> [size, last_access]
+        self._pins = collections.Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.sweep()
+
+    def _scan(self):
+        found = {}
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                found[os.path.relpath(path, self.directory)] = (st.st_size, max(st.st_mtime, st.st_atime))
+        return found
+
+    def _remove_locked(self, name):
+        size, _ = self._files.pop(name)
+        self.current_bytes -= size
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            pass
+        return size
+
+    def _evict_locked(self, keep=()):
+        # Least recently used first, skipping pinned files and `keep`
+        for name in list(self._files):
+            if self.current_bytes <= self.max_bytes:
+                break
+            if name in keep or self._pins[name]:
+                continue
+            self.evicted_bytes += self._remove_locked(name)
+            self.evictions += 1
+
+    @contextlib.contextmanager
+    def pinned(self, names):
+        """Keep `names` from being evicted or expired inside the block."""
+        names = list(names)
+        with self._lock:
+            self._pins.update(names)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._pins.subtract(names)
+                self._pins += collections.Counter()  # drop zero counts
+
+    def record_write(self, *names):
+        """Track files just written, or reused by a new upload.
+
+        All of `names` are recorded before anything is evicted, and none of
+        them is evicted by this call.
+        """
+        now = time.time()
+        sizes = {}
+        for name in names:
+            try:
+                sizes[name] = os.path.getsize(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+        with self._lock:
+            for name, size in sizes.items():
+                old = self._files.pop(name, None)
+                if old is not None:
+                    self.current_bytes -= old[0]
+                self._files[name] = [size, now]
+                self.current_bytes += size
+            self._evict_locked(keep=sizes)
+
+    def touch(self, name):
+        """Record a read of `name`. Returns whether the file is stored."""
+        with self._lock:
+            entry = self._files.get(name)
+            if entry is None:
+                self.misses += 1
+                return False
+            entry[1] = time.time()
+            self._files.move_to_end(name)
+            self.hits += 1
+            return True
+
+    def sweep(self):
+        """Resync with the directory, then expire and evict as needed."""
+        found = self._scan()
+        now = time.time()
+        with self._lock:
+            files = {}
+            for name, (size, disk_access) in found.items():
+                entry = self._files.get(name)
+                files[name] = [size, max(disk_access, entry[1]) if entry else disk_access]
+            self._files = collections.OrderedDict(sorted(files.items(), key=lambda item: item[1][1]))
+            self.current_bytes = sum(size for size, _ in self._files.values())
+
+            if self.ttl is not None:
+                for name in [n for n, (_, accessed) in self._files.items()
+                             if now - accessed > self.ttl and not self._pins[n]]:
+                    self.evicted_bytes += self._remove_locked(name)
+                    self.expirations += 1
+            self._evict_locked()
+            self.last_sweep = now
+
+    def _run(self):
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Upload sweep failed: {e}")
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'files': len(self._files),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'evicted_bytes': self.evicted_bytes,
+                'last_sweep': self.last_sweep,
+            }
@@ -2,9 +2,8 @@ from PIL import Image
 import numpy as np
 import cv2
 import os
-from colormath.color_objects import sRGBColor, LabColor
-from colormath.color_conversions import convert_color
-from colormath.color_diff import delta_e_cie2000
+
+from color_pairs import find_indistinguishable_pairs
 
 # ------------ Configuration ------------
 INPUT_IMAGE_PATH = "colorpic.jpg"  # <- replace with your image path
@@ -28,26 +27,8 @@ def simulate_colorblind(image_np, matrix):
 
 # Helper: analyze indistinguishable colors
 def analyze_colors(image_np):
-    height, width, _ = image_np.shape
-    color_set = {}
-    indistinguishable_pairs = []
-
-    for y in range(0, height, 10):  # Step size of 10 pixels
-        for x in range(0, width, 10):
-            r, g, b = image_np[y, x]
-            srgb = sRGBColor(r / 255, g / 255, b / 255)
-            lab = convert_color(srgb, LabColor)
-            hex_code = '#{:02x}{:02x}{:02x}'.format(r, g, b)
-
-            for existing_hex, existing_lab in color_set.items():
-                delta = delta_e_cie2000(lab, existing_lab)
-                if delta < DELTA_THRESHOLD:
-                    indistinguishable_pairs.append((existing_hex, hex_code))
-                    break
-            else:
-                color_set[hex_code] = lab
-
-    return indistinguishable_pairs
+    result = find_indistinguishable_pairs(image_np, threshold=DELTA_THRESHOLD)
+    return [(pair['color1'], pair['color2']) for pair in result['pairs']]
 
 def main():
     os.makedirs(OUTPUT_DIR, exist_ok=True)
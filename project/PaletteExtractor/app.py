@@ -2,11 +2,33 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 from PIL import Image
 import numpy as np
-from sklearn.cluster import KMeans
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from colorkit.palette import ALGORITHMS, extract_palette as compute_palette, to_hex
+from sessions import SessionStore
 
 app = Flask(__name__)
 CORS(app)
 
+# Clustering engine used when a request does not pick one. "histogram"
+# matches full KMeans closely at a fraction of the cost; "kmeans" is the
+# original exhaustive clustering.
+DEFAULT_ALGORITHM = os.environ.get('PALETTE_ALGORITHM', 'histogram')
+
+# Uploaded images kept for interactive crop queries
+sessions = SessionStore(
+    max_sessions=int(os.environ.get('PALETTE_MAX_SESSIONS', 32)),
+    ttl=float(os.environ.get('PALETTE_SESSION_TTL', 30 * 60)),
+)
+
+def palette_response(palette):
+    result = []
+    for color, proportion in zip(palette.colors, palette.proportions):
+        result.append({"color": to_hex(color), "proportion": float(proportion)})
+    return sorted(result, key=lambda c: c["proportion"], reverse=True)[:10]
+
 @app.route("/extract_palette", methods=["POST"])
 def extract_palette():
     file = request.files['image']
@@ -15,23 +37,57 @@ def extract_palette():
     width = int(float(request.form['width']))
     height = int(float(request.form['height']))
 
+    algorithm = request.form.get('algorithm', DEFAULT_ALGORITHM)
+    if algorithm not in ALGORITHMS:
+        return jsonify({'error': f"Unknown algorithm '{algorithm}', expected one of {list(ALGORITHMS)}"}), 400
+    time_budget = request.form.get('time_budget', type=float)
+    quantize_bits = request.form.get('quantize_bits', type=int)
+    if quantize_bits is not None and not 1 <= quantize_bits <= 8:
+        return jsonify({'error': 'quantize_bits must be between 1 and 8'}), 400
+
     image = Image.open(file).convert("RGB")
-    cropped = image.crop((x, y, x + width, y + height))
-    img_data = np.array(cropped).reshape((-1, 3))
+    try:
+        cropped = image.crop((x, y, x + width, y + height))
+        img_data = np.array(cropped).reshape((-1, 3))
+        palette = compute_palette(img_data, n_colors=10, algorithm=algorithm,
+                                  time_budget=time_budget, quantize_bits=quantize_bits)
+    except ValueError as e:
+        # Empty or inverted crops
+        return jsonify({'error': f'Invalid region: {e}'}), 400
 
-    kmeans = KMeans(n_clusters=10, random_state=0).fit(img_data)
-    unique, counts = np.unique(kmeans.labels_, return_counts=True)
+    return jsonify(palette_response(palette))
 
-    total = sum(counts)
-    result = []
-    for cluster_index, count in zip(unique, counts):
-        r, g, b = kmeans.cluster_centers_[cluster_index].astype(int)
-        hex_color = "#{:02x}{:02x}{:02x}".format(r, g, b)
-        proportion = count / total
-        result.append({"color": hex_color, "proportion": proportion})
-
-    result = sorted(result, key=lambda c: c["proportion"], reverse=True)[:10]
-    return jsonify(result)
+@app.route("/palette_session", methods=["POST"])
+def create_palette_session():
+    # Upload once, then query crops with /palette_session/<id>/extract
+    if 'image' not in request.files:
+        return jsonify({'error': 'No image uploaded'}), 400
+    image = Image.open(request.files['image']).convert("RGB")
+    session_id, session = sessions.create(np.array(image))
+    return jsonify({'session_id': session_id, 'width': session.width, 'height': session.height})
+
+@app.route("/palette_session/<session_id>/extract", methods=["POST"])
+def extract_session_palette(session_id):
+    session = sessions.get(session_id)
+    if session is None:
+        return jsonify({'error': 'Session not found or expired'}), 404
+    data = request.get_json(silent=True) or request.form
+    try:
+        x = int(float(data['x']))
+        y = int(float(data['y']))
+        width = int(float(data['width']))
+        height = int(float(data['height']))
+        time_budget = float(data.get('time_budget', 0.05))
+        palette = session.palette(x, y, width, height, n_colors=10, time_budget=time_budget)
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid region: {e}'}), 400
+    return jsonify(palette_response(palette))
+
+@app.route("/palette_session/<session_id>", methods=["DELETE"])
+def delete_palette_session(session_id):
+    if not sessions.delete(session_id):
+        return jsonify({'error': 'Session not found or expired'}), 404
+    return jsonify({'status': 'deleted'})
 
 if __name__ == "__main__":
     app.run(port=5003)
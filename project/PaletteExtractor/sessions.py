@@ -0,0 +1,78 @@
+import collections
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from colorkit.integral import IntegralHistogram
+from colorkit.palette import palette_from_clusters, weighted_kmeans
+
+
+class PaletteSession:
+    """One uploaded image prepared for repeated crop queries.
+
+    Holds the integral color histogram of the image and the centers of the
+    last palette, so each new rectangle only has to read its histogram and
+    run a few warm-started k-means iterations over the occupied bins.
+    """
+
+    def __init__(self, image_rgb, bits=4):
+        self.index = IntegralHistogram(image_rgb, bits=bits)
+        self.width, self.height = self.index.width, self.index.height
+        self.last_centers = None
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+    def palette(self, x, y, width, height, n_colors=10, time_budget=0.05):
+        counts = self.index.region(x, y, width, height)
+        present = np.flatnonzero(counts)
+        if len(present) == 0:
+            raise ValueError("Selected region is empty")
+        points = self.index.bin_colors[present]
+        weights = counts[present].astype(np.float64)
+
+        with self.lock:
+            deadline = time.monotonic() + time_budget if time_budget else None
+            centers, labels = weighted_kmeans(points, weights, n_colors, deadline=deadline,
+                                              init=self.last_centers)
+            self.last_centers = centers
+        return palette_from_clusters(centers, np.bincount(labels, weights=weights, minlength=len(centers)))
+
+
+class SessionStore:
+    """In-process sessions, dropped least-recently-used first or after a TTL."""
+
+    def __init__(self, max_sessions=32, ttl=30 * 60):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, image_rgb):
+        session = PaletteSession(image_rgb)
+        session_id = str(uuid.uuid4())
+        with self._lock:
+            self._expire()
+            self._sessions[session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session_id, session
+
+    def get(self, session_id):
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+                session.last_used = time.monotonic()
+            return session
+
+    def delete(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl
+        for session_id in [k for k, s in self._sessions.items() if s.last_used < cutoff]:
+            del self._sessions[session_id]
@@ -0,0 +1,63 @@
+"""Per-lookup cost of the old pandas row loop vs. colorkit.names.
+
+Run from the project directory:  python benchmarks/bench_color_names.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from colorkit.names import CSV_COLUMNS, ColorNameIndex
+
+CSV_PATH = os.path.join(os.path.dirname(__file__), '..', 'startDetection', 'c.csv')
+
+
+def loop_lookup(csv, R, G, B):
+    # The per-row implementation previously copied into every app
+    minimum = float('inf')
+    cname = ""
+    for i in range(len(csv)):
+        d = abs(R - int(csv.loc[i, "R"])) + abs(G - int(csv.loc[i, "G"])) + abs(B - int(csv.loc[i, "B"]))
+        if d < minimum:
+            minimum = d
+            cname = csv.loc[i, "color_name"]
+    return cname
+
+
+def timeit(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    csv = pd.read_csv(CSV_PATH, names=CSV_COLUMNS, header=None)
+    index = ColorNameIndex.from_dataframe(csv)
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 256, size=(20, 3))
+
+    for R, G, B in pixels:
+        assert loop_lookup(csv, R, G, B) == index.nearest(R, G, B)[0]
+
+    loop_t = timeit(lambda: [loop_lookup(csv, *p) for p in pixels[:5]], 3) / 5
+    single_t = timeit(lambda: [index.nearest(*p) for p in pixels], 200) / len(pixels)
+
+    batch = rng.integers(0, 256, size=(100_000, 3))
+    batch_t = timeit(lambda: index.nearest_index(batch), 3) / len(batch)
+
+    lut_index = ColorNameIndex.from_dataframe(csv).use_lut()
+    assert (lut_index.nearest_index(batch) == index.nearest_index(batch)).all()
+    lut_t = timeit(lambda: lut_index.nearest_index(batch), 20) / len(batch)
+
+    print(f"pandas loop      : {loop_t * 1e6:10.1f} us/lookup")
+    print(f"index, single    : {single_t * 1e6:10.1f} us/lookup  ({loop_t / single_t:,.0f}x)")
+    print(f"index, batch 100k: {batch_t * 1e6:10.3f} us/lookup  ({loop_t / batch_t:,.0f}x)")
+    print(f"lut, batch 100k  : {lut_t * 1e6:10.3f} us/lookup  ({loop_t / lut_t:,.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""colorkit.delta_e: validation against colormath and throughput in pairs/s.
+
+Checks CIEDE2000 against the Sharma, Wu & Dalal (2005) test data and all
+three metrics against colormath's reference implementation, then times
+pairwise() per metric.
+
+Run from the project directory:  python benchmarks/bench_delta_e.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from colormath import color_diff_matrix
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from colorkit.delta_e import METRICS, cie76, cie94, ciede2000, nearest, pairwise
+
+# Sharma et al. (2005), Table 1: Lab 1, Lab 2, expected CIEDE2000
+SHARMA = np.array([
+    [50.0000, 2.6772, -79.7751, 50.0000, 0.0000, -82.7485, 2.0425],
+    [50.0000, 3.1571, -77.2803, 50.0000, 0.0000, -82.7485, 2.8615],
+    [50.0000, 2.8361, -74.0200, 50.0000, 0.0000, -82.7485, 3.4412],
+    [50.0000, -1.3802, -84.2814, 50.0000, 0.0000, -82.7485, 1.0000],
+    [50.0000, -1.1848, -84.8006, 50.0000, 0.0000, -82.7485, 1.0000],
+    [50.0000, -0.9009, -85.5211, 50.0000, 0.0000, -82.7485, 1.0000],
+    [50.0000, 0.0000, 0.0000, 50.0000, -1.0000, 2.0000, 2.3669],
+    [50.0000, -1.0000, 2.0000, 50.0000, 0.0000, 0.0000, 2.3669],
+    [50.0000, 2.4900, -0.0010, 50.0000, -2.4900, 0.0009, 7.1792],
+    [50.0000, 2.4900, -0.0010, 50.0000, -2.4900, 0.0010, 7.1792],
+    [50.0000, 2.4900, -0.0010, 50.0000, -2.4900, 0.0011, 7.2195],
+    [50.0000, 2.4900, -0.0010, 50.0000, -2.4900, 0.0012, 7.2195],
+    [50.0000, -0.0010, 2.4900, 50.0000, 0.0009, -2.4900, 4.8045],
+    [50.0000, -0.0010, 2.4900, 50.0000, 0.0010, -2.4900, 4.8045],
+    [50.0000, -0.0010, 2.4900, 50.0000, 0.0011, -2.4900, 4.7461],
+    [50.0000, 2.5000, 0.0000, 50.0000, 0.0000, -2.5000, 4.3065],
+    [50.0000, 2.5000, 0.0000, 73.0000, 25.0000, -18.0000, 27.1492],
+    [50.0000, 2.5000, 0.0000, 61.0000, -5.0000, 29.0000, 22.8977],
+    [50.0000, 2.5000, 0.0000, 56.0000, -27.0000, -3.0000, 31.9030],
+    [50.0000, 2.5000, 0.0000, 58.0000, 24.0000, 15.0000, 19.4535],
+    [50.0000, 2.5000, 0.0000, 50.0000, 3.1736, 0.5854, 1.0000],
+    [50.0000, 2.5000, 0.0000, 50.0000, 3.2972, 0.0000, 1.0000],
+    [50.0000, 2.5000, 0.0000, 50.0000, 1.8634, 0.5757, 1.0000],
+    [50.0000, 2.5000, 0.0000, 50.0000, 3.2592, 0.3350, 1.0000],
+    [60.2574, -34.0099, 36.2677, 60.4626, -34.1751, 39.4387, 1.2644],
+    [63.0109, -31.0961, -5.8663, 62.8187, -29.7946, -4.0864, 1.2630],
+    [61.2901, 3.7196, -5.3901, 61.4292, 2.2480, -4.9620, 1.8731],
+    [35.0831, -44.1164, 3.7933, 35.0232, -40.0716, 1.5901, 1.8645],
+    [22.7233, 20.0904, -46.6940, 23.0331, 14.9730, -42.5619, 2.0373],
+    [36.4612, 47.8580, 18.3852, 36.2715, 50.5065, 21.2231, 1.4146],
+    [90.8027, -2.0831, 1.4410, 91.1528, -1.6435, 0.0447, 1.4441],
+    [90.9257, -0.5406, -0.9208, 88.6381, -0.8985, -0.7239, 1.5381],
+    [6.7747, -0.2908, -2.4247, 5.8714, -0.0985, -2.2286, 0.6377],
+    [2.0776, 0.0795, -1.1350, 0.9033, -0.0636, -0.5514, 0.9082],
+])
+
+REFERENCE = {
+    "cie76": (cie76, color_diff_matrix.delta_e_cie1976),
+    "cie94": (cie94, color_diff_matrix.delta_e_cie1994),
+    "ciede2000": (ciede2000, color_diff_matrix.delta_e_cie2000),
+}
+
+
+def random_lab(rng, n):
+    return rng.uniform([0, -110, -110], [100, 110, 110], (n, 3))
+
+
+def validate(rng):
+    lab1, lab2, expected = SHARMA[:, :3], SHARMA[:, 3:6], SHARMA[:, 6]
+    ours = ciede2000(lab1, lab2)
+    theirs = np.array([color_diff_matrix.delta_e_cie2000(a, b[None])[0] for a, b in zip(lab1, lab2)])
+    print(f"Sharma CIEDE2000 ({len(SHARMA)} pairs): max |ours - table| {np.abs(ours - expected).max():.2e}, "
+          f"max |colormath - table| {np.abs(theirs - expected).max():.2e}, "
+          f"symmetric {np.allclose(ours, ciede2000(lab2, lab1))}")
+
+    colors = random_lab(rng, 200)
+    palette = random_lab(rng, 300)
+    for metric, (kernel, reference) in REFERENCE.items():
+        expected = np.array([reference(c, palette) for c in colors])
+        got = pairwise(colors, palette, metric, chunk_pairs=5000)
+        print(f"{metric:<10} vs colormath on 200x300 random pairs: max abs diff {np.abs(got - expected).max():.2e}")
+
+    index, distance = nearest(colors, palette, "ciede2000", chunk_pairs=5000)
+    full = pairwise(colors, palette, "ciede2000")
+    assert (index == full.argmin(axis=1)).all() and np.allclose(distance, full.min(axis=1))
+
+
+def throughput(rng, n=2000, m=2000):
+    lab1 = random_lab(rng, n)
+    lab2 = random_lab(rng, m)
+    print(f"\npairwise() on {n}x{m} pairs:")
+    for metric in METRICS:
+        tracemalloc.start()
+        start = time.perf_counter()
+        pairwise(lab1, lab2, metric)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"  {metric:<10} {n * m / elapsed / 1e6:7.2f} M pairs/s   peak {peak / 1e6:6.1f} MB "
+              f"(output {n * m * 8 / 1e6:.1f} MB)")
+
+    # colormath's own vectorized kernel, one reference color at a time
+    start = time.perf_counter()
+    for color in lab1[:200]:
+        color_diff_matrix.delta_e_cie2000(color, lab2)
+    elapsed = time.perf_counter() - start
+    print(f"  colormath ciede2000 (row at a time) {200 * m / elapsed / 1e6:7.2f} M pairs/s")
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    validate(rng)
+    throughput(rng)
@@ -0,0 +1,51 @@
+"""Dominant colors: 100x100 resize + np.unique vs sampled packed bincount.
+
+Run from the project directory:  python benchmarks/bench_dominant_colors.py [image]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'ColorAccessibilityAnalyzer')))
+from color_processing import extract_dominant_colors, rgb_to_hex
+
+ROOT = os.path.join(os.path.dirname(__file__), '..', '..')
+REPEATS = 20
+
+
+def legacy(image, n_colors=8):
+    # The previous implementation
+    pixels = np.array(image.resize((100, 100))).reshape(-1, 3)
+    pixels = (pixels // 16) * 16
+    colors, counts = np.unique(pixels, axis=0, return_counts=True)
+    return [rgb_to_hex(color) for color in colors[np.argsort(-counts)][:n_colors]]
+
+
+def timeit(fn):
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        result = fn()
+    return (time.perf_counter() - start) / REPEATS, result
+
+
+def main(path):
+    image = Image.open(path).convert('RGB')
+    image_np = np.array(image)
+    print(f"{os.path.basename(path)}: {image.width}x{image.height}")
+
+    cases = [
+        ('legacy', lambda: legacy(image)),
+        ('bincount', lambda: extract_dominant_colors(image_np, merge_delta_e=None)),
+        ('bincount+merge', lambda: extract_dominant_colors(image_np)),
+        ('5 bits+merge', lambda: extract_dominant_colors(image_np, bits=5)),
+    ]
+    for name, fn in cases:
+        elapsed, colors = timeit(fn)
+        print(f"  {name:<15} {elapsed * 1000:7.2f} ms  {' '.join(colors)}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) > 1 else os.path.join(ROOT, 'colorpic.jpg'))
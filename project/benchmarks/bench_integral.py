@@ -0,0 +1,57 @@
+"""Rectangle histogram cost: colorkit.integral vs cropping and counting.
+
+Run from the project directory:  python benchmarks/bench_integral.py [image]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from colorkit.integral import BIN_CONFIGS, IntegralHistogram
+
+ROOT = os.path.join(os.path.dirname(__file__), '..', '..')
+SIZES = (0.1, 0.3, 0.6, 0.9)
+
+
+def naive_region(index, x, y, width, height):
+    # What callers do without the index: crop the keys and count them
+    x0, y0, x1, y1 = index.clip(x, y, width, height)
+    return np.bincount(index.keys[y0:y1, x0:x1].ravel(), minlength=index.n_bins)
+
+
+def timeit(fn, rects):
+    start = time.perf_counter()
+    for rect in rects:
+        fn(*rect)
+    return (time.perf_counter() - start) / len(rects)
+
+
+def main(path):
+    image = np.array(Image.open(path).convert('RGB'))
+    height, width = image.shape[:2]
+    rng = np.random.default_rng(0)
+    print(f"{os.path.basename(path)}: {width}x{height}")
+
+    for name in BIN_CONFIGS:
+        start = time.perf_counter()
+        index = IntegralHistogram(image, bits=name)
+        build = time.perf_counter() - start
+        print(f"  {name:<8} {index.n_bins:5d} bins  cell {index.cell:3d}  "
+              f"{index.nbytes / 1e6:6.1f} MB  build {build * 1000:7.1f} ms")
+        for frac in SIZES:
+            w, h = int(width * frac), int(height * frac)
+            rects = [(int(rng.integers(0, width - w + 1)), int(rng.integers(0, height - h + 1)), w, h)
+                     for _ in range(50)]
+            for rect in rects[:5]:
+                assert (index.region(*rect) == naive_region(index, *rect)).all()
+            fast = timeit(index.region, rects)
+            naive = timeit(lambda *r: naive_region(index, *r), rects)
+            print(f"    {int(frac * 100):3d}% rect  integral {fast * 1e6:8.1f} us   "
+                  f"crop {naive * 1e6:9.1f} us   ({naive / fast:5.1f}x)")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) > 1 else os.path.join(ROOT, 'colorpic.jpg'))
@@ -0,0 +1,59 @@
+"""Latency and accuracy of colorkit.palette algorithms against full KMeans.
+
+The baseline is KMeans over every pixel, as /extract_palette originally
+ran it. Accuracy is the mean squared RGB error of snapping every pixel to
+its nearest palette color (lower is better), shown relative to the
+baseline. "dprop" is the largest difference in sorted palette proportions.
+
+Run from the project directory:  python benchmarks/bench_palette.py [image]
+"""
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from colorkit.palette import ALGORITHMS, extract_palette, unique_colors
+
+ROOT = os.path.join(os.path.dirname(__file__), '..', '..')
+
+
+def default_images():
+    uploads = sorted(glob.glob(os.path.join(ROOT, 'static', 'uploads', '*2560x1440_original_*.jpg')))
+    vector_art = sorted(glob.glob(os.path.join(ROOT, 'static', 'uploads', 'spider-man-vector-art-*_original_*.jpg')))
+    return [os.path.join(ROOT, 'colorpic.jpg')] + uploads[:1] + vector_art[:1]
+
+
+def quantization_error(pixels, colors, sample=200_000):
+    rng = np.random.default_rng(0)
+    if len(pixels) > sample:
+        pixels = pixels[rng.choice(len(pixels), sample, replace=False)]
+    pixels = pixels.astype(np.float64)
+    d = ((pixels[:, None, :] - colors[None, :, :].astype(np.float64)) ** 2).sum(axis=2)
+    return d.min(axis=1).mean()
+
+
+def main(paths):
+    runs = [('per-pixel', 'kmeans', {'dedupe': False})] + [(name, name, {}) for name in ALGORITHMS]
+    for path in paths:
+        pixels = np.array(Image.open(path).convert('RGB')).reshape(-1, 3)
+        n_unique = len(unique_colors(pixels)[1])
+        print(f"{os.path.basename(path)}: {len(pixels):,} pixels, {n_unique:,} unique colors")
+        baseline = None
+        for label, algorithm, options in runs:
+            start = time.perf_counter()
+            palette = extract_palette(pixels, 10, algorithm, **options)
+            elapsed = time.perf_counter() - start
+            error = quantization_error(pixels, palette.colors)
+            baseline = baseline or (elapsed, error, palette.proportions)
+            k = min(len(palette.proportions), len(baseline[2]))
+            dprop = np.abs(palette.proportions[:k] - baseline[2][:k]).max()
+            print(f"  {label:<11} {elapsed * 1000:9.1f} ms  ({baseline[0] / elapsed:6.1f}x)"
+                  f"   error {error:8.1f}  ({error / baseline[1]:.2f}x)   dprop {dprop:.3f}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:] or default_images())
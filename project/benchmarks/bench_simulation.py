@@ -0,0 +1,60 @@
+"""Color-blindness simulation: per-mode float64 loop vs the fused transform.
+
+Run from the project directory:  python benchmarks/bench_simulation.py [image]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'ColorAccessibilityAnalyzer')))
+from color_processing import FusedSimulator, color_matrices, simulate, simulate_linear, simulation_matrices
+
+ROOT = os.path.join(os.path.dirname(__file__), '..', '..')
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main(path):
+    image = np.array(Image.open(path).convert('RGB'))
+    height, width = image.shape[:2]
+    print(f"{os.path.basename(path)}: {width}x{height}, {len(color_matrices)} modes")
+
+    reference, elapsed, peak = measure(
+        lambda: {mode: simulate(image, matrix) for mode, matrix in color_matrices.items()})
+    print(f"  loop      {elapsed * 1000:8.1f} ms   peak {peak / 1e6:7.1f} MB")
+
+    for precision in ('float32', 'fixed'):
+        simulator = FusedSimulator(color_matrices, precision)
+        outputs = simulator.allocate(image.shape)
+        # Outputs are preallocated, as the upload pipeline does with shared memory
+        _, elapsed, peak = measure(lambda: simulator.run(image, outputs))
+        diff = max(int(np.abs(reference[m].astype(np.int16) - outputs[m]).max()) for m in outputs)
+        print(f"  {precision:<8}  {elapsed * 1000:8.1f} ms   peak {peak / 1e6:7.1f} MB   max diff {diff}")
+
+    # Linear-RGB (Machado) modes: exact float64 sRGB curves vs the table path
+    for severity in (0.5, 1.0):
+        matrices, _ = simulation_matrices('machado', severity)
+        reference, elapsed, peak = measure(
+            lambda: {mode: simulate_linear(image, matrix) for mode, matrix in matrices.items()})
+        print(f"  machado {severity:.1f}  exact  {elapsed * 1000:8.1f} ms   peak {peak / 1e6:7.1f} MB")
+        simulator = FusedSimulator(matrices, linear=True)
+        outputs = simulator.allocate(image.shape)
+        _, elapsed, peak = measure(lambda: simulator.run(image, outputs))
+        diff = max(int(np.abs(reference[m].astype(np.int16) - outputs[m]).max()) for m in outputs)
+        print(f"  machado {severity:.1f}  lut    {elapsed * 1000:8.1f} ms   peak {peak / 1e6:7.1f} MB   max diff {diff}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) > 1 else os.path.join(ROOT, 'colorpic.jpg'))
@@ -0,0 +1,89 @@
+"""KNeighborsRegressor.predict + name search vs. the compiled colorkit.snap model.
+
+Run from the project directory:  python benchmarks/bench_snap.py [--full]
+
+--full compares the predicted color for all 2**24 inputs instead of a
+random sample. Names depend only on the predicted color, so they are
+checked once per distinct prediction.
+"""
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KNeighborsRegressor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from colorkit import lut
+from colorkit.names import CSV_COLUMNS, ColorNameIndex
+from colorkit.snap import ColorSnapper
+
+CSV_PATH = os.path.join(os.path.dirname(__file__), '..', 'startDetection', 'c.csv')
+
+
+def timeit(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def two_stage(knn_model, index, rgb):
+    # What the apps did per request before the compiled model
+    predicted = knn_model.predict(rgb).astype(int)
+    names, _ = index.nearest_batch(predicted)
+    return predicted, names
+
+
+def main():
+    # The apps fit on a DataFrame and predict on arrays
+    warnings.filterwarnings('ignore', message='X does not have valid feature names')
+    csv = pd.read_csv(CSV_PATH, names=CSV_COLUMNS, header=None)
+    index = ColorNameIndex.from_dataframe(csv)
+    knn_model = KNeighborsRegressor(n_neighbors=3)
+    knn_model.fit(csv[["R", "G", "B"]], csv[["R", "G", "B"]])
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        fallback = ColorSnapper(index.rgb, name_index=index, cache_dir=cache_dir)
+        fallback_t = timeit(lambda: fallback.snap(np.array([12, 200, 99])), 200)
+        compile_t = timeit(fallback.build, 1)
+        load_t = timeit(lambda: ColorSnapper(index.rgb, name_index=index, cache_dir=cache_dir), 20)
+        snapper = ColorSnapper(index.rgb, name_index=index, cache_dir=cache_dir)
+        assert snapper.compiled
+
+        if '--full' in sys.argv:
+            keys = np.arange(lut.LUT_SIZE, dtype=np.int32)
+            checks = np.stack([keys >> 16, (keys >> 8) & 255, keys & 255], axis=1)
+        else:
+            checks = np.random.default_rng(0).integers(0, 256, size=(500_000, 3))
+        for start in range(0, len(checks), 1 << 20):
+            block = checks[start:start + (1 << 20)]
+            assert np.array_equal(knn_model.predict(block).astype(int), snapper.predict(block))
+        names, _ = index.nearest_batch(snapper.colors)
+        assert (names == index.names[snapper.name_rows()]).all()
+        distinct = len(snapper.colors)
+
+        pixel = np.array([[12, 200, 99]])
+        old_t = timeit(lambda: two_stage(knn_model, index, pixel), 200)
+        new_t = timeit(lambda: snapper.snap(pixel[0]), 2000)
+
+        batch = np.random.default_rng(1).integers(0, 256, size=(100_000, 3))
+        old_batch_t = timeit(lambda: two_stage(knn_model, index, batch), 3) / len(batch)
+        new_batch_t = timeit(lambda: snapper.snap(batch), 20) / len(batch)
+        del snapper, fallback
+
+    print(f"{len(checks):,} inputs identical to predict(), {distinct:,} distinct predictions named")
+    print(f"compile          : {compile_t:10.1f} s (once per c.csv)")
+    print(f"construct + load : {load_t * 1e3:10.2f} ms")
+    print(f"uncompiled snap  : {fallback_t * 1e6:10.1f} us/lookup")
+    print(f"two-stage, single: {old_t * 1e6:10.1f} us/lookup")
+    print(f"snap, single     : {new_t * 1e6:10.1f} us/lookup  ({old_t / new_t:,.0f}x)")
+    print(f"two-stage, 100k  : {old_batch_t * 1e6:10.3f} us/lookup")
+    print(f"snap, 100k       : {new_batch_t * 1e6:10.3f} us/lookup  ({old_batch_t / new_batch_t:,.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1 @@
+# Shared color helpers used by the Flask services and the desktop scripts.
@@ -0,0 +1,29 @@
+import contextlib
+import os
+import tempfile
+
+
+@contextlib.contextmanager
+def atomic_write(path):
+    """Open a binary temp file next to `path` and rename it over `path`.
+
+    The rename only happens if the block finishes without an exception,
+    so readers (including other processes) see either the old file or
+    the complete new one. On failure the temp file is removed. Temp files
+    end in .tmp, which the upload sweeper skips.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_atomic(path, data):
+    """Write `data` (bytes) to `path` through atomic_write()."""
+    with atomic_write(path) as f:
+        f.write(data)
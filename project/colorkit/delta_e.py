@@ -0,0 +1,153 @@
+import numpy as np
+
+METRICS = ("cie76", "cie94", "ciede2000")
+
+# Pairs evaluated per block by pairwise() and nearest(). CIEDE2000 keeps a
+# few dozen float64 temporaries per pair, so a block needs roughly 20 MB of
+# scratch; small blocks also stay closer to cache.
+CHUNK_PAIRS = 1 << 16
+
+_POW25_7 = 25.0 ** 7
+_TWO_PI = 2 * np.pi
+_RAD25, _RAD30, _RAD275 = np.radians([25.0, 30.0, 275.0])
+_COS30, _SIN30 = np.cos(np.radians(30)), np.sin(np.radians(30))
+_COS6, _SIN6 = np.cos(np.radians(6)), np.sin(np.radians(6))
+_COS63, _SIN63 = np.cos(np.radians(63)), np.sin(np.radians(63))
+
+
+def cie76(lab1, lab2):
+    """CIE 1976 difference (Euclidean distance in Lab) of (..., 3) arrays."""
+    lab1 = np.asarray(lab1, dtype=np.float64)
+    lab2 = np.asarray(lab2, dtype=np.float64)
+    # Channel by channel, so pairwise() never builds an (N, M, 3) array
+    dL = lab1[..., 0] - lab2[..., 0]
+    da = lab1[..., 1] - lab2[..., 1]
+    db = lab1[..., 2] - lab2[..., 2]
+    return np.sqrt(dL * dL + da * da + db * db)
+
+
+def cie94(lab1, lab2, textiles=False):
+    """CIE 1994 difference with lab1 as the reference color.
+
+    Uses the graphic-arts constants unless textiles=True.
+    """
+    kL, K1, K2 = (2.0, 0.048, 0.014) if textiles else (1.0, 0.045, 0.015)
+    lab1 = np.asarray(lab1, dtype=np.float64)
+    lab2 = np.asarray(lab2, dtype=np.float64)
+    dL = lab1[..., 0] - lab2[..., 0]
+    C1 = np.hypot(lab1[..., 1], lab1[..., 2])
+    C2 = np.hypot(lab2[..., 1], lab2[..., 2])
+    dC = C1 - C2
+    da = lab1[..., 1] - lab2[..., 1]
+    db = lab1[..., 2] - lab2[..., 2]
+    dH2 = np.maximum(da ** 2 + db ** 2 - dC ** 2, 0)
+    return np.sqrt((dL / kL) ** 2 + (dC / (1 + K1 * C1)) ** 2 + dH2 / (1 + K2 * C1) ** 2)
+
+
+def ciede2000(lab1, lab2, kL=1.0, kC=1.0, kH=1.0):
+    """CIEDE2000 color difference between broadcastable (..., 3) Lab arrays.
+
+    Hue angles are kept in radians, dH' comes from dot and cross products,
+    and T's four cosines are expanded from cos(h) and sin(h), which keeps
+    the trigonometric calls per pair to a minimum.
+    """
+    lab1 = np.asarray(lab1, dtype=np.float64)
+    lab2 = np.asarray(lab2, dtype=np.float64)
+    L1, a1, b1 = lab1[..., 0], lab1[..., 1], lab1[..., 2]
+    L2, a2, b2 = lab2[..., 0], lab2[..., 1], lab2[..., 2]
+
+    C_mean7 = ((np.hypot(a1, b1) + np.hypot(a2, b2)) / 2) ** 7
+    G1 = 1.5 - 0.5 * np.sqrt(C_mean7 / (C_mean7 + _POW25_7))
+    a1p = G1 * a1
+    a2p = G1 * a2
+    C1p = np.hypot(a1p, b1)
+    C2p = np.hypot(a2p, b2)
+    h1p = np.arctan2(b1, a1p) % _TWO_PI
+    h2p = np.arctan2(b2, a2p) % _TWO_PI
+
+    # dH' = 2 sqrt(C1'C2') sin(dh'/2), taken from the dot and cross products
+    # of (a', b) instead of the angles: |dH'|^2 = 2 (C1'C2' - a1'a2' - b1 b2),
+    # with the sign of sin(dh'). Zero when either chroma is zero.
+    C1C2 = C1p * C2p
+    chroma_zero = C1C2 == 0
+    dHp = np.sqrt(np.maximum(2 * (C1C2 - a1p * a2p - b1 * b2), 0))
+    sign = np.sign(a1p * b2 - a2p * b1)
+    # Opposite hues: dh' is exactly +-180 degrees and keeps its own sign
+    sign = np.where(sign == 0, np.sign(h2p - h1p), sign)
+    dHp = dHp * sign
+
+    h_sum = h1p + h2p
+    hp_mean = np.where(np.abs(h1p - h2p) > np.pi,
+                       np.where(h_sum < _TWO_PI, h_sum + _TWO_PI, h_sum - _TWO_PI), h_sum) / 2
+    hp_mean = np.where(chroma_zero, h_sum, hp_mean)
+
+    # T from multiple-angle identities instead of four separate cosines
+    c1, s1 = np.cos(hp_mean), np.sin(hp_mean)
+    c2, s2 = 2 * c1 * c1 - 1, 2 * s1 * c1
+    c3, s3 = c1 * (4 * c1 * c1 - 3), s1 * (3 - 4 * s1 * s1)
+    c4, s4 = 2 * c2 * c2 - 1, 2 * s2 * c2
+    T = (1 - 0.17 * (c1 * _COS30 + s1 * _SIN30)
+         + 0.24 * c2
+         + 0.32 * (c3 * _COS6 - s3 * _SIN6)
+         - 0.20 * (c4 * _COS63 + s4 * _SIN63))
+
+    Cp_mean = (C1p + C2p) / 2
+    Cp_mean7 = Cp_mean ** 7
+    R_C = 2 * np.sqrt(Cp_mean7 / (Cp_mean7 + _POW25_7))
+    d_theta = _RAD30 * np.exp(-(((hp_mean - _RAD275) / _RAD25) ** 2))
+    R_T = -np.sin(2 * d_theta) * R_C
+    L50 = ((L1 + L2) / 2 - 50) ** 2
+    S_L = 1 + 0.015 * L50 / np.sqrt(20 + L50)
+
+    dL = (L2 - L1) / (kL * S_L)
+    dC = (C2p - C1p) / (kC * (1 + 0.045 * Cp_mean))
+    dH = dHp / (kH * (1 + 0.015 * Cp_mean * T))
+    return np.sqrt(dL ** 2 + dC ** 2 + dH ** 2 + R_T * dC * dH)
+
+
+_KERNELS = {"cie76": cie76, "cie94": cie94, "ciede2000": ciede2000}
+
+
+def _kernel(metric):
+    if metric not in _KERNELS:
+        raise ValueError(f"Unknown metric '{metric}', expected one of {list(METRICS)}")
+    return _KERNELS[metric]
+
+
+def _row_blocks(n_rows, n_cols, chunk_pairs):
+    rows = max(1, chunk_pairs // max(1, n_cols))
+    for start in range(0, n_rows, rows):
+        yield start, min(start + rows, n_rows)
+
+
+def pairwise(lab1, lab2, metric="ciede2000", chunk_pairs=CHUNK_PAIRS):
+    """(N, M) matrix of differences between (N, 3) and (M, 3) Lab arrays.
+
+    Rows are computed in blocks of about `chunk_pairs` pairs, so scratch
+    memory stays bounded however large N is.
+    """
+    kernel = _kernel(metric)
+    lab1 = np.asarray(lab1, dtype=np.float64).reshape(-1, 3)
+    lab2 = np.asarray(lab2, dtype=np.float64).reshape(-1, 3)
+    out = np.empty((len(lab1), len(lab2)))
+    for start, stop in _row_blocks(len(lab1), len(lab2), chunk_pairs):
+        out[start:stop] = kernel(lab1[start:stop, None, :], lab2[None, :, :])
+    return out
+
+
+def nearest(lab, palette_lab, metric="ciede2000", chunk_pairs=CHUNK_PAIRS):
+    """Closest palette entry for each (N, 3) Lab color.
+
+    Returns (indices, distances) without materializing the full N x M
+    matrix.
+    """
+    kernel = _kernel(metric)
+    lab = np.asarray(lab, dtype=np.float64).reshape(-1, 3)
+    palette_lab = np.asarray(palette_lab, dtype=np.float64).reshape(-1, 3)
+    indices = np.empty(len(lab), dtype=np.intp)
+    distances = np.empty(len(lab))
+    for start, stop in _row_blocks(len(lab), len(palette_lab), chunk_pairs):
+        block = kernel(lab[start:stop, None, :], palette_lab[None, :, :])
+        indices[start:stop] = block.argmin(axis=1)
+        distances[start:stop] = block[np.arange(stop - start), indices[start:stop]]
+    return indices, distances
@@ -0,0 +1,135 @@
+import numpy as np
+
+# Named bin layouts as bits per (R, G, B) channel. Fewer bins mean a smaller
+# integral and finer cells for the same memory budget.
+BIN_CONFIGS = {
+    "coarse": (2, 2, 2),     # 64 bins
+    "compact": (3, 3, 2),    # 256 bins
+    "default": (4, 4, 4),    # 4096 bins
+}
+
+
+def _channel_bits(bits):
+    if isinstance(bits, str):
+        if bits not in BIN_CONFIGS:
+            raise ValueError(f"Unknown bin config '{bits}', expected one of {list(BIN_CONFIGS)}")
+        return BIN_CONFIGS[bits]
+    if isinstance(bits, int):
+        bits = (bits, bits, bits)
+    bits = tuple(int(b) for b in bits)
+    if len(bits) != 3 or not all(1 <= b <= 8 for b in bits) or sum(bits) > 16:
+        raise ValueError("bits must be 1-8 per channel and at most 16 in total")
+    return bits
+
+
+class IntegralHistogram:
+    """Quantized color histogram of any rectangle of one image.
+
+    Pixels are binned by `bits` (an int for all channels, an (R, G, B) tuple,
+    or a BIN_CONFIGS name). Per-cell histograms over a grid of `cell` x
+    `cell` pixel cells are summed into a 2D integral image, so the cells
+    fully inside a rectangle cost four lookups per bin. The partial cells
+    along its border are counted directly from the stored bin keys, which
+    keeps results exact.
+
+    The cell size grows as needed to keep the integral under `max_bytes`.
+    """
+
+    def __init__(self, image_rgb, bits=4, cell=16, max_bytes=32 * 1024 * 1024):
+        image_rgb = np.asarray(image_rgb, dtype=np.uint8)
+        self.height, self.width = image_rgb.shape[:2]
+        self.bits = _channel_bits(bits)
+        br, bg, bb = self.bits
+        self.n_bins = 1 << (br + bg + bb)
+
+        # Counts never exceed the pixel count, so small images get a
+        # narrower integral.
+        dtype = np.uint16 if self.height * self.width < (1 << 16) else np.uint32
+        itemsize = np.dtype(dtype).itemsize
+        while (self.height // cell + 1) * (self.width // cell + 1) * self.n_bins * itemsize > max_bytes:
+            cell *= 2
+        self.cell = cell
+
+        r = image_rgb[..., 0].astype(np.uint16) >> (8 - br)
+        g = image_rgb[..., 1].astype(np.uint16) >> (8 - bg)
+        b = image_rgb[..., 2].astype(np.uint16) >> (8 - bb)
+        self.keys = (r << (bg + bb)) | (g << bb) | b
+
+        # Mean color of each bin over the whole image, used to place the bins
+        # in color space for clustering. Empty bins fall back to their center.
+        flat = self.keys.ravel()
+        counts = np.bincount(flat, minlength=self.n_bins)
+        sums = np.stack([np.bincount(flat, weights=image_rgb[..., c].ravel(), minlength=self.n_bins)
+                         for c in range(3)], axis=1)
+        idx = np.arange(self.n_bins)
+        levels = [(idx >> (bg + bb)) & ((1 << br) - 1), (idx >> bb) & ((1 << bg) - 1), idx & ((1 << bb) - 1)]
+        centers = np.stack([(lvl << (8 - n)) + (1 << (8 - n) >> 1) for lvl, n in zip(levels, self.bits)],
+                           axis=1).astype(np.float64)
+        occupied = counts > 0
+        centers[occupied] = sums[occupied] / counts[occupied, None]
+        self.bin_colors = centers
+        self.total_counts = counts
+
+        # Integral over whole cells only; the ragged right/bottom edge is
+        # handled by the border path in region().
+        rows, cols = self.height // cell, self.width // cell
+        cell_keys = self.keys[:rows * cell, :cols * cell]
+        cell_id = (np.arange(rows * cell) // cell)[:, None] * cols + (np.arange(cols * cell) // cell)[None, :]
+        per_cell = np.bincount((cell_id * self.n_bins + cell_keys).ravel(),
+                               minlength=rows * cols * self.n_bins).reshape(rows, cols, self.n_bins)
+        self.integral = np.zeros((rows + 1, cols + 1, self.n_bins), dtype=dtype)
+        np.cumsum(np.cumsum(per_cell, axis=0), axis=1, out=self.integral[1:, 1:])
+
+    @property
+    def nbytes(self):
+        return self.keys.nbytes + self.integral.nbytes + self.bin_colors.nbytes + self.total_counts.nbytes
+
+    def clip(self, x, y, width, height):
+        """Normalize a possibly negative-size rectangle and clip it to the image."""
+        if width < 0:
+            x, width = x + width, -width
+        if height < 0:
+            y, height = y + height, -height
+        x0, y0 = max(0, int(x)), max(0, int(y))
+        x1, y1 = min(self.width, int(x + width)), min(self.height, int(y + height))
+        return x0, y0, max(x0, x1), max(y0, y1)
+
+    def region(self, x, y, width, height):
+        """Bin counts for the rectangle, shape (n_bins,)."""
+        x0, y0, x1, y1 = self.clip(x, y, width, height)
+        cell = self.cell
+        # Whole cells inside the rectangle
+        cx0, cy0 = -(-x0 // cell), -(-y0 // cell)
+        cx1 = min(x1 // cell, self.integral.shape[1] - 1)
+        cy1 = min(y1 // cell, self.integral.shape[0] - 1)
+        if cx1 <= cx0 or cy1 <= cy0:
+            return np.bincount(self.keys[y0:y1, x0:x1].ravel(), minlength=self.n_bins)
+
+        I = self.integral
+        counts = (I[cy1, cx1].astype(np.int64) - I[cy0, cx1] - I[cy1, cx0] + I[cy0, cx0])
+
+        # Border strips around the cell-aligned block
+        ix0, iy0, ix1, iy1 = cx0 * cell, cy0 * cell, cx1 * cell, cy1 * cell
+        strips = (
+            self.keys[y0:iy0, x0:x1],    # top
+            self.keys[iy1:y1, x0:x1],    # bottom
+            self.keys[iy0:iy1, x0:ix0],  # left
+            self.keys[iy0:iy1, ix1:x1],  # right
+        )
+        for strip in strips:
+            if strip.size:
+                counts += np.bincount(strip.ravel(), minlength=self.n_bins)
+        return counts
+
+    def dominant_colors(self, x, y, width, height, n_colors=8):
+        """Top `n_colors` bins of a rectangle as (colors, fractions).
+
+        Colors are the image-wide mean of each bin as float (n, 3) RGB.
+        """
+        counts = self.region(x, y, width, height)
+        total = counts.sum()
+        if total == 0:
+            return np.empty((0, 3)), np.empty(0)
+        top = np.argsort(-counts, kind="stable")[:n_colors]
+        top = top[counts[top] > 0]
+        return self.bin_colors[top], counts[top] / total
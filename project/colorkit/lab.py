@@ -0,0 +1,31 @@
+import numpy as np
+
+# D65 reference white, matching colormath's default sRGB -> Lab conversion
+D65_WHITE = np.array([0.95047, 1.00000, 1.08883])
+
+# Linear sRGB -> XYZ (D65), the coefficients colormath uses
+SRGB_TO_XYZ = np.array([
+    [0.412424, 0.357579, 0.180464],
+    [0.212656, 0.715158, 0.0721856],
+    [0.0193324, 0.119193, 0.950444],
+])
+
+_EPSILON = 216 / 24389
+_KAPPA = 24389 / 27
+
+
+def srgb_to_linear(rgb):
+    """sRGB values in 0..255 to linear RGB in 0..1."""
+    v = np.asarray(rgb, dtype=np.float64) / 255.0
+    return np.where(v <= 0.04045, v / 12.92, ((v + 0.055) / 1.055) ** 2.4)
+
+
+def srgb_to_lab(rgb):
+    """Convert (..., 3) sRGB values in 0..255 to CIE Lab (D65)."""
+    xyz = srgb_to_linear(rgb) @ SRGB_TO_XYZ.T / D65_WHITE
+    f = np.where(xyz > _EPSILON, np.cbrt(xyz), (_KAPPA * xyz + 16) / 116)
+    return np.stack([
+        116 * f[..., 1] - 16,
+        500 * (f[..., 0] - f[..., 1]),
+        200 * (f[..., 1] - f[..., 2]),
+    ], axis=-1)
@@ -0,0 +1,92 @@
+import hashlib
+import os
+
+import numpy as np
+
+from colorkit.atomic import atomic_write
+
+# Bump when the table layout or the tie-breaking rules change
+LUT_VERSION = 1
+
+LUT_SIZE = 1 << 24
+# Tables are 32 MB each, so they go in the user's cache directory rather
+# than the source tree. COLOR_LUT_DIR overrides the location.
+DEFAULT_CACHE_DIR = os.environ.get('COLOR_LUT_DIR') or os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'colorkit')
+
+# Edge length of the RGB sub-cubes the build works through. Each cube only
+# scores the palette entries that could possibly be nearest to some point in it.
+_CUBE = 16
+
+
+def pack_rgb(rgb):
+    """(..., 3) RGB -> (...,) int32 keys of the form R << 16 | G << 8 | B."""
+    rgb = np.asarray(rgb).astype(np.int32, copy=False)
+    return (rgb[..., 0] << 16) | (rgb[..., 1] << 8) | rgb[..., 2]
+
+
+def palette_hash(palette_rgb, metric):
+    digest = hashlib.sha256()
+    digest.update(f"v{LUT_VERSION}:{metric}:".encode())
+    digest.update(np.ascontiguousarray(palette_rgb, dtype=np.int16).tobytes())
+    return digest.hexdigest()[:20]
+
+
+def _box_distance(palette, lo, hi, metric):
+    # Smallest and largest distance from each palette color to the box [lo, hi]
+    near = np.maximum(np.maximum(lo - palette, palette - hi), 0)
+    far = np.maximum(np.abs(palette - lo), np.abs(palette - hi))
+    if metric == "manhattan":
+        return near.sum(axis=1), far.sum(axis=1)
+    return (near * near).sum(axis=1), (far * far).sum(axis=1)
+
+
+def build_table(palette_rgb, metric="manhattan"):
+    """Nearest palette row for every 24-bit RGB value, as a flat uint16 array.
+
+    Matches ColorNameIndex.nearest_index exactly, including first-row tie
+    breaking, because candidates are scored in their original row order.
+    """
+    palette = np.asarray(palette_rgb, dtype=np.int32).reshape(-1, 3)
+    if len(palette) > np.iinfo(np.uint16).max:
+        raise ValueError("Palette too large for a uint16 lookup table")
+
+    table = np.empty(LUT_SIZE, dtype=np.uint16)
+    axis = np.arange(_CUBE, dtype=np.int32)
+    offsets = np.stack(np.meshgrid(axis, axis, axis, indexing="ij"), axis=-1).reshape(-1, 3)
+
+    for r0 in range(0, 256, _CUBE):
+        for g0 in range(0, 256, _CUBE):
+            for b0 in range(0, 256, _CUBE):
+                lo = np.array([r0, g0, b0], dtype=np.int32)
+                near, far = _box_distance(palette, lo, lo + _CUBE - 1, metric)
+                candidates = np.flatnonzero(near <= far.min())
+
+                points = lo + offsets
+                diff = points[:, None, :] - palette[candidates][None, :, :]
+                if metric == "manhattan":
+                    dist = np.abs(diff).sum(axis=2)
+                else:
+                    dist = (diff * diff).sum(axis=2)
+                table[pack_rgb(points)] = candidates[dist.argmin(axis=1)]
+    return table
+
+
+def load_or_build(palette_rgb, metric="manhattan", cache_dir=None):
+    """Memory-map the table for this palette, building it first if needed.
+
+    The file name carries a hash of the palette, so editing c.csv produces a
+    new table on the next start. The read-only mapping lives in the page
+    cache and is shared by every worker process on the host.
+    """
+    cache_dir = cache_dir or DEFAULT_CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"colorlut_{metric}_{palette_hash(palette_rgb, metric)}.u16")
+
+    if not os.path.exists(path) or os.path.getsize(path) != LUT_SIZE * 2:
+        table = build_table(palette_rgb, metric)
+        # Concurrent workers never map a half-written table
+        with atomic_write(path) as f:
+            table.tofile(f)
+
+    return np.memmap(path, dtype=np.uint16, mode="r", shape=(LUT_SIZE,))
@@ -0,0 +1,137 @@
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+
+from colorkit import lut
+from colorkit.delta_e import ciede2000
+from colorkit.lab import srgb_to_lab
+
+# Column layout of c.csv (no header row)
+CSV_COLUMNS = ["color", "color_name", "hex", "R", "G", "B"]
+
+# Rows per block when answering batch queries, keeps the (block, n_colors)
+# distance matrix small no matter how many pixels are asked for.
+QUERY_BLOCK = 2048
+
+# "manhattan" and "euclidean" compare sRGB values. "lab" is the nearest
+# entry in CIE Lab (CIE76), "ciede2000" re-ranks the LAB_CANDIDATES nearest
+# Lab entries by CIEDE2000.
+METRICS = ("manhattan", "euclidean", "lab", "ciede2000")
+RGB_METRICS = ("manhattan", "euclidean")
+
+LAB_CANDIDATES = 16
+
+
+class ColorNameIndex:
+    """Nearest color-name lookup over the c.csv palette.
+
+    The palette is held as one contiguous (n, 3) int16 array so a query for a
+    single pixel or a batch of N pixels is one vectorized distance/argmin.
+    Ties resolve to the first row, same as the old per-row loops. The Lab
+    metrics go through a KD-tree over the palette's Lab values, built once
+    when the index is created.
+    """
+
+    def __init__(self, keys, names, hex_codes, rgb):
+        self.keys = np.asarray(keys, dtype=object)
+        self.names = np.asarray(names, dtype=object)
+        self.hex_codes = np.asarray(hex_codes, dtype=object)
+        self.rgb = np.ascontiguousarray(rgb, dtype=np.int16).reshape(-1, 3)
+        self.lab = srgb_to_lab(self.rgb)
+        self._lab_tree = KDTree(self.lab)
+        # metric -> memory-mapped 2**24 entry table, see use_lut()
+        self._luts = {}
+
+    @classmethod
+    def from_dataframe(cls, df):
+        return cls(df["color"].values, df["color_name"].values,
+                   df["hex"].values, df[["R", "G", "B"]].values)
+
+    @classmethod
+    def from_csv(cls, path):
+        return cls.from_dataframe(pd.read_csv(path, names=CSV_COLUMNS, header=None))
+
+    def __len__(self):
+        return len(self.rgb)
+
+    def use_lut(self, metric="manhattan", cache_dir=None):
+        """Answer `metric` queries from a precomputed RGB -> row table.
+
+        The table is built on first use (a few seconds) and cached on disk
+        keyed by the palette contents; see colorkit.lut.
+        """
+        if metric not in RGB_METRICS:
+            raise ValueError(f"Lookup tables support {RGB_METRICS}, not '{metric}'")
+        self._luts[metric] = lut.load_or_build(self.rgb, metric, cache_dir)
+        return self
+
+    def has_lut(self, metric="manhattan"):
+        return metric in self._luts
+
+    def nearest_index(self, rgb, metric="manhattan"):
+        """Row index of the closest palette entry for each RGB triple.
+
+        `rgb` may be a single (3,) triple or any (..., 3) array; the result has
+        the leading shape of the input.
+        """
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric '{metric}', expected one of {METRICS}")
+
+        query = np.asarray(rgb)
+        out_shape = query.shape[:-1]
+        query = np.clip(query.reshape(-1, 3), 0, 255)
+
+        table = self._luts.get(metric)
+        if table is not None:
+            return table[lut.pack_rgb(query)].astype(np.intp).reshape(out_shape)
+        if metric not in RGB_METRICS:
+            return self._nearest_lab(query, metric).reshape(out_shape)
+
+        query = query.astype(np.int16)
+        result = np.empty(len(query), dtype=np.intp)
+        palette = self.rgb
+        for start in range(0, len(query), QUERY_BLOCK):
+            block = query[start:start + QUERY_BLOCK]
+            diff = block[:, None, :] - palette[None, :, :]
+            if metric == "manhattan":
+                dist = np.abs(diff).sum(axis=2, dtype=np.int16)
+            else:
+                diff = diff.astype(np.int32)
+                dist = (diff * diff).sum(axis=2)
+            result[start:start + len(block)] = dist.argmin(axis=1)
+        return result.reshape(out_shape)
+
+    def _nearest_lab(self, query, metric):
+        result = np.empty(len(query), dtype=np.intp)
+        k = 1 if metric == "lab" else min(LAB_CANDIDATES, len(self.lab))
+        for start in range(0, len(query), QUERY_BLOCK):
+            lab = srgb_to_lab(query[start:start + QUERY_BLOCK])
+            candidates = self._lab_tree.query(lab, k=k, return_distance=False)
+            if k > 1:
+                delta = ciede2000(lab[:, None, :], self.lab[candidates])
+                candidates = candidates[np.arange(len(lab)), delta.argmin(axis=1)][:, None]
+            result[start:start + len(lab)] = candidates[:, 0]
+        return result
+
+    def nearest(self, R, G, B, metric="manhattan"):
+        """Return (color_name, hex) for one pixel."""
+        i = int(self.nearest_index((int(R), int(G), int(B)), metric))
+        return self.names[i], self.hex_codes[i]
+
+    def nearest_batch(self, rgb, metric="manhattan"):
+        """Return (names, hex_codes) arrays for a batch of pixels."""
+        idx = self.nearest_index(rgb, metric)
+        return self.names[idx], self.hex_codes[idx]
+
+
+@lru_cache(maxsize=None)
+def _load_index(path):
+    return ColorNameIndex.from_csv(path)
+
+
+def load_index(path):
+    """Load c.csv once per process; later calls share the same index."""
+    return _load_index(os.path.abspath(path))
@@ -0,0 +1,230 @@
+import collections
+import time
+
+import numpy as np
+from PIL import Image
+
+Palette = collections.namedtuple("Palette", ["colors", "proportions"])
+
+ALGORITHMS = ("kmeans", "minibatch", "histogram", "median_cut", "octree")
+
+# Pixels sampled for MiniBatch k-means
+MINIBATCH_SAMPLE = 50000
+MINIBATCH_SIZE = 4096
+
+# Bits per channel kept by the histogram algorithm (32768 possible bins)
+HISTOGRAM_BITS = 5
+
+# Rough single-core throughput of PIL's quantizers, used to turn a time
+# budget into a pixel budget for the one-pass algorithms.
+_QUANTIZE_PIXELS_PER_SECOND = {"median_cut": 2.5e6, "octree": 2e7}
+
+
+def unique_colors(pixels, bits=8):
+    """Collapse (N, 3) uint8 pixels to distinct colors with counts.
+
+    With bits < 8 each channel is first quantized to that many bits and each
+    returned color is the mean of the pixels in its bin. Returns (colors,
+    counts) as float64 (M, 3) and int64 (M,) arrays. Clustering the colors
+    weighted by their counts is equivalent to clustering every pixel, but it
+    costs O(M) instead of O(N), and M is tiny for flat artwork.
+    """
+    pixels = np.asarray(pixels, dtype=np.uint8).reshape(-1, 3)
+    shift = 8 - bits
+    q = pixels.astype(np.int32) >> shift
+    keys = (q[:, 0] << (2 * bits)) | (q[:, 1] << bits) | q[:, 2]
+
+    if bits <= 6:
+        # Up to 2**18 bins, a dense bincount beats sorting
+        counts = np.bincount(keys, minlength=1 << (3 * bits))
+        present = np.flatnonzero(counts)
+        inverse = None
+        counts = counts[present]
+    else:
+        present, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+
+    if shift == 0:
+        colors = np.stack([present >> 16, (present >> 8) & 0xFF, present & 0xFF], axis=1).astype(np.float64)
+        return colors, counts
+
+    if inverse is None:
+        lookup = np.zeros(1 << (3 * bits), dtype=np.intp)
+        lookup[present] = np.arange(len(present))
+        inverse = lookup[keys]
+    sums = np.stack([np.bincount(inverse, weights=pixels[:, c], minlength=len(present)) for c in range(3)], axis=1)
+    return sums / counts[:, None], counts
+
+
+def palette_from_clusters(centers, weights):
+    """Palette from cluster centers and their total weights.
+
+    Empty clusters are dropped and the rest sorted by share, largest first.
+    """
+    keep = weights > 0
+    centers, weights = centers[keep], weights[keep]
+    order = np.argsort(-weights, kind="stable")
+    colors = np.clip(centers[order], 0, 255).astype(np.uint8)
+    return Palette(colors, weights[order] / weights.sum())
+
+
+def _assign(points, centers):
+    d = (points[:, None, :] - centers[None, :, :]) ** 2
+    return d.sum(axis=2).argmin(axis=1)
+
+
+def weighted_kmeans(points, weights, n_clusters, max_iter=100, deadline=None, random_state=0, tol=1e-3,
+                    init=None):
+    """Lloyd's k-means on weighted points with k-means++ seeding.
+
+    `init` warm-starts from existing centers; k-means++ fills in any centers
+    beyond those given. Stops early once centers move less than `tol` or
+    `deadline` (a time.monotonic() value) passes. Returns (centers, labels).
+    """
+    points = np.asarray(points, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    n_clusters = min(n_clusters, len(points))
+    rng = np.random.default_rng(random_state)
+
+    centers = np.empty((n_clusters, points.shape[1]))
+    seeded = 0
+    if init is not None:
+        seeded = min(len(init), n_clusters)
+        centers[:seeded] = np.asarray(init, dtype=np.float64)[:seeded]
+    if seeded == 0:
+        centers[0] = points[rng.choice(len(points), p=weights / weights.sum())]
+        seeded = 1
+    closest = ((points[:, None, :] - centers[None, :seeded, :]) ** 2).sum(axis=2).min(axis=1)
+    for i in range(seeded, n_clusters):
+        p = closest * weights
+        total = p.sum()
+        idx = rng.choice(len(points), p=p / total) if total > 0 else rng.integers(len(points))
+        centers[i] = points[idx]
+        closest = np.minimum(closest, ((points - centers[i]) ** 2).sum(axis=1))
+
+    labels = _assign(points, centers)
+    for _ in range(max_iter):
+        if deadline is not None and time.monotonic() > deadline:
+            break
+        sums = np.zeros_like(centers)
+        for c in range(points.shape[1]):
+            sums[:, c] = np.bincount(labels, weights=weights * points[:, c], minlength=n_clusters)
+        mass = np.bincount(labels, weights=weights, minlength=n_clusters)
+        moved = mass > 0
+        new_centers = centers.copy()
+        new_centers[moved] = sums[moved] / mass[moved, None]
+        shift = np.abs(new_centers - centers).max()
+        centers = new_centers
+        labels = _assign(points, centers)
+        if shift < tol:
+            break
+    return centers, labels
+
+
+def _kmeans(pixels, n_colors, time_budget, random_state, quantize_bits=None, dedupe=True):
+    # Reference implementation: what /extract_palette has always run,
+    # optionally on the weighted unique colors instead of every pixel.
+    from sklearn.cluster import KMeans
+
+    if dedupe:
+        points, weights = unique_colors(pixels, quantize_bits or 8)
+    else:
+        points, weights = pixels, np.ones(len(pixels))
+        n_colors = min(n_colors, len(unique_colors(pixels)[1]))
+    n_colors = min(n_colors, len(points))
+    kmeans = KMeans(n_clusters=n_colors, random_state=random_state).fit(points, sample_weight=weights)
+    counts = np.bincount(kmeans.labels_, weights=weights, minlength=n_colors)
+    return palette_from_clusters(kmeans.cluster_centers_, counts.astype(np.float64))
+
+
+def _minibatch(pixels, n_colors, time_budget, random_state, **_):
+    from sklearn.cluster import MiniBatchKMeans
+
+    rng = np.random.default_rng(random_state)
+    sample = pixels
+    if len(pixels) > MINIBATCH_SAMPLE:
+        sample = pixels[rng.choice(len(pixels), MINIBATCH_SAMPLE, replace=False)]
+    sample = sample.astype(np.float64)
+    n_colors = min(n_colors, len(sample))
+
+    model = MiniBatchKMeans(n_clusters=n_colors, batch_size=MINIBATCH_SIZE, random_state=random_state, n_init=1)
+    deadline = time.monotonic() + time_budget if time_budget else None
+    # Fixed number of passes over the sample unless the budget runs out first
+    for _ in range(10):
+        for start in range(0, len(sample), MINIBATCH_SIZE):
+            batch = sample[start:start + MINIBATCH_SIZE]
+            if len(batch) < n_colors and start:
+                continue
+            model.partial_fit(batch)
+            if deadline is not None and time.monotonic() > deadline:
+                break
+        else:
+            continue
+        break
+
+    centers = model.cluster_centers_
+    counts = np.bincount(_assign(sample, centers), minlength=len(centers))
+    return palette_from_clusters(centers, counts.astype(np.float64))
+
+
+def _histogram(pixels, n_colors, time_budget, random_state, quantize_bits=None, dedupe=True):
+    # Cluster on the mean color of each occupied bin rather than its center,
+    # so sparse bins do not drag the palette toward the bin grid.
+    points, weights = unique_colors(pixels, quantize_bits or HISTOGRAM_BITS)
+    weights = weights.astype(np.float64)
+
+    deadline = time.monotonic() + time_budget if time_budget else None
+    centers, labels = weighted_kmeans(points, weights, n_colors, deadline=deadline, random_state=random_state)
+    return palette_from_clusters(centers, np.bincount(labels, weights=weights, minlength=len(centers)))
+
+
+def _pil_quantize(method_name):
+    def run(pixels, n_colors, time_budget, random_state, **_):
+        if time_budget:
+            limit = int(time_budget * _QUANTIZE_PIXELS_PER_SECOND[method_name])
+            if len(pixels) > limit:
+                rng = np.random.default_rng(random_state)
+                pixels = pixels[rng.choice(len(pixels), min(max(limit, n_colors), len(pixels)), replace=False)]
+        method = Image.Quantize.MEDIANCUT if method_name == "median_cut" else Image.Quantize.FASTOCTREE
+        image = Image.fromarray(np.ascontiguousarray(pixels.reshape(1, -1, 3)), "RGB")
+        quantized = image.quantize(colors=n_colors, method=method)
+        palette = np.array(quantized.getpalette()[:3 * 256], dtype=np.float64).reshape(-1, 3)
+        counts = np.bincount(np.asarray(quantized).ravel(), minlength=len(palette))
+        return palette_from_clusters(palette, counts.astype(np.float64))
+    return run
+
+
+_ENGINES = {
+    "kmeans": _kmeans,
+    "minibatch": _minibatch,
+    "histogram": _histogram,
+    "median_cut": _pil_quantize("median_cut"),
+    "octree": _pil_quantize("octree"),
+}
+
+
+def extract_palette(pixels, n_colors=10, algorithm="kmeans", time_budget=None, random_state=0,
+                    quantize_bits=None, dedupe=True):
+    """Palette of an (N, 3) uint8 RGB pixel array.
+
+    `algorithm` is one of ALGORITHMS. `time_budget` (seconds) caps the
+    iterative refinement, or the number of pixels examined for median_cut and
+    octree; results stay usable but coarser when the budget is tight.
+
+    kmeans and histogram cluster the weighted unique colors from
+    unique_colors(); `quantize_bits` sets how many bits per channel are kept
+    first (8, exact, for kmeans; HISTOGRAM_BITS for histogram).
+    dedupe=False makes kmeans cluster every pixel as it originally did.
+    """
+    if algorithm not in _ENGINES:
+        raise ValueError(f"Unknown palette algorithm '{algorithm}', expected one of {ALGORITHMS}")
+    pixels = np.asarray(pixels, dtype=np.uint8).reshape(-1, 3)
+    if len(pixels) == 0:
+        raise ValueError("Cannot extract a palette from an empty region")
+    if quantize_bits is not None and not 1 <= quantize_bits <= 8:
+        raise ValueError("quantize_bits must be between 1 and 8")
+    return _ENGINES[algorithm](pixels, n_colors, time_budget, random_state,
+                               quantize_bits=quantize_bits, dedupe=dedupe)
+
+
+def to_hex(color):
+    return "#{:02x}{:02x}{:02x}".format(*(int(c) for c in color))
@@ -0,0 +1,55 @@
+import base64
+
+import cv2
+import numpy as np
+
+
+def label_frame(index, frame_bgr, block=1, metric="manhattan"):
+    """Label a BGR frame with nearest c.csv rows.
+
+    With block > 1 the frame is first area-averaged down by that factor, so
+    each label covers a block x block patch.
+    """
+    if block > 1:
+        height, width = frame_bgr.shape[:2]
+        size = (max(1, width // block), max(1, height // block))
+        frame_bgr = cv2.resize(frame_bgr, size, interpolation=cv2.INTER_AREA)
+    rgb = frame_bgr[..., ::-1]
+    return index.nearest_index(rgb, metric)
+
+
+def summarize_labels(index, labels, block=1):
+    """Compact JSON-ready summary of a label map.
+
+    Labels are renumbered to the colors actually present, stored as uint8
+    when 256 or fewer names occur (uint16 otherwise) and base64 encoded. The
+    histogram gives each name's share of the frame, largest first.
+    """
+    counts = np.bincount(labels.ravel(), minlength=len(index))
+    present = np.flatnonzero(counts)
+    local = np.zeros(len(index), dtype=np.uint16)
+    local[present] = np.arange(len(present))
+
+    dtype = np.uint8 if len(present) <= 256 else np.uint16
+    local_labels = local[labels].astype(dtype)
+
+    total = labels.size
+    order = present[np.argsort(-counts[present], kind="stable")]
+    histogram = [{
+        'name': index.names[i],
+        'hex': index.hex_codes[i],
+        'pixels': int(counts[i]) * block * block,
+        'fraction': counts[i] / total,
+    } for i in order]
+
+    return {
+        'width': int(labels.shape[1]),
+        'height': int(labels.shape[0]),
+        'block': block,
+        'palette': [{'name': index.names[i], 'hex': index.hex_codes[i]} for i in present],
+        'labels': {
+            'dtype': np.dtype(dtype).name,
+            'data': base64.b64encode(local_labels.tobytes()).decode('ascii'),
+        },
+        'histogram': histogram,
+    }
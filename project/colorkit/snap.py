@@ -0,0 +1,191 @@
+"""KNN color cleanup and naming, compiled into lookup tables.
+
+Build the tables ahead of time (about 40 s, once per c.csv and sklearn
+version) with:
+
+    python -m colorkit.snap path/to/c.csv [--cache-dir DIR]
+"""
+import argparse
+import hashlib
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.neighbors import KNeighborsRegressor
+
+from colorkit import lut
+from colorkit.atomic import atomic_write
+from colorkit.names import CSV_COLUMNS
+
+# Bump when the file layout or the compile step changes
+SNAP_VERSION = 1
+
+# Query points per KNeighborsRegressor.predict call while compiling
+COMPILE_BLOCK = 1 << 20
+
+
+def model_hash(train_rgb, target_rgb, n_neighbors):
+    digest = hashlib.sha256()
+    # Neighbor tie-breaking is up to sklearn, so its version is part of the key
+    digest.update(f"v{SNAP_VERSION}:k{n_neighbors}:sklearn{sklearn.__version__}:".encode())
+    digest.update(np.ascontiguousarray(train_rgb, dtype=np.int16).tobytes())
+    digest.update(np.ascontiguousarray(target_rgb, dtype=np.int16).tobytes())
+    return digest.hexdigest()[:20]
+
+
+def fit_model(train_rgb, target_rgb, n_neighbors=3):
+    model = KNeighborsRegressor(n_neighbors=n_neighbors)
+    return model.fit(np.asarray(train_rgb), np.asarray(target_rgb))
+
+
+def compile_model(model):
+    """Run a fitted KNN color cleanup for every 24-bit RGB value.
+
+    Calls model.predict() on all 2**24 inputs, so the result is the model's
+    own output, ties included. Returns (slots, colors): `colors` holds each
+    distinct predicted color once as (m, 3) uint8, and `slots` is a flat
+    uint16 array giving the row of `colors` for each packed input.
+    """
+    packed = np.empty(lut.LUT_SIZE, dtype=np.int32)
+    keys = np.arange(COMPILE_BLOCK, dtype=np.int32)
+    for start in range(0, lut.LUT_SIZE, COMPILE_BLOCK):
+        block = keys + start
+        rgb = np.stack([block >> 16, (block >> 8) & 255, block & 255], axis=1)
+        predicted = np.clip(model.predict(rgb).astype(int), 0, 255)
+        packed[start:start + COMPILE_BLOCK] = lut.pack_rgb(predicted)
+
+    unique, slots = np.unique(packed, return_inverse=True)
+    if len(unique) > np.iinfo(np.uint16).max:
+        raise ValueError("Too many distinct predicted colors for a uint16 table")
+    colors = np.stack([unique >> 16, (unique >> 8) & 255, unique & 255], axis=1).astype(np.uint8)
+    return slots.astype(np.uint16), colors
+
+
+class ColorSnapper:
+    """KNN color cleanup followed by naming.
+
+    The apps clean a clicked pixel with KNeighborsRegressor(n_neighbors=3)
+    over c.csv and then name the cleaned color. Both steps depend only on
+    the input RGB, so the regression can be compiled into a 2**24 entry
+    slot table (see compile_model), with names looked up once per distinct
+    cleaned color. A query is then two array lookups.
+
+    The table is only read from disk, never compiled on construction.
+    Until it exists, queries fall back to calling the fitted model
+    directly. Results are the same either way. Create the table with
+    build(), build_in_background() or the command in the module docstring.
+    """
+
+    def __init__(self, train_rgb, target_rgb=None, n_neighbors=3, name_index=None, cache_dir=None):
+        target_rgb = train_rgb if target_rgb is None else target_rgb
+        self.model = fit_model(train_rgb, target_rgb, n_neighbors)
+        self.name_index = name_index
+        self.cache_dir = cache_dir or lut.DEFAULT_CACHE_DIR
+        base = os.path.join(self.cache_dir, f"colorsnap_{model_hash(train_rgb, target_rgb, n_neighbors)}")
+        self.slots_path, self.colors_path = base + ".slots.npy", base + ".colors.npy"
+        # (slots, colors, {metric: name row per color}), swapped in as a whole
+        self._table = None
+        self._build_lock = threading.Lock()
+        self.load()
+
+    @property
+    def compiled(self):
+        return self._table is not None
+
+    def load(self):
+        """Memory-map the compiled table if it is on disk. Returns compiled."""
+        if self._table is None and os.path.exists(self.slots_path):
+            slots = np.load(self.slots_path, mmap_mode="r")
+            if slots.shape != (lut.LUT_SIZE,):
+                raise ValueError(f"Corrupt color snapping table: {self.slots_path}")
+            self._table = (slots, np.load(self.colors_path), {})
+        return self.compiled
+
+    def build(self):
+        """Compile the table, write it to the cache dir and start using it."""
+        with self._build_lock:
+            if self.load():
+                return
+            slots, colors = compile_model(self.model)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # The slot table goes last, its presence marks a complete model
+            with atomic_write(self.colors_path) as f:
+                np.save(f, colors)
+            with atomic_write(self.slots_path) as f:
+                np.save(f, slots)
+            self.load()
+
+    def build_in_background(self):
+        """Compile on a daemon thread, serving from the model meanwhile."""
+        def run():
+            try:
+                self.build()
+            except Exception as e:
+                print(f"Color snapping table build failed: {e}")
+
+        thread = threading.Thread(target=run, name="colorsnap-build", daemon=True)
+        thread.start()
+        return thread
+
+    @property
+    def colors(self):
+        """Distinct predicted colors, (m, 3) uint8, or None before compiling."""
+        table = self._table
+        return None if table is None else table[1]
+
+    def name_rows(self, metric="manhattan"):
+        """Name index row for each of `colors`, computed once per metric."""
+        return self._name_rows(self._table, metric)
+
+    def _name_rows(self, table, metric):
+        _, colors, rows = table
+        if metric not in rows:
+            rows[metric] = self.name_index.nearest_index(colors, metric)
+        return rows[metric]
+
+    def predict(self, rgb):
+        """Cleaned RGB, the same as model.predict(rgb).astype(int)."""
+        query = np.clip(np.asarray(rgb), 0, 255)
+        table = self._table
+        if table is None:
+            return self.model.predict(query.reshape(-1, 3)).astype(int).reshape(query.shape)
+        slots, colors, _ = table
+        return colors[slots[lut.pack_rgb(query)].astype(np.intp)].astype(int)
+
+    def snap(self, rgb, metric="manhattan"):
+        """Return (predicted_rgb, names, hex_codes) for (..., 3) RGB inputs."""
+        query = np.clip(np.asarray(rgb), 0, 255)
+        table = self._table
+        if table is None:
+            predicted = self.predict(query)
+            rows = self.name_index.nearest_index(predicted, metric)
+        else:
+            slots, colors, _ = table
+            slot = slots[lut.pack_rgb(query)].astype(np.intp)
+            predicted = colors[slot].astype(int)
+            rows = self._name_rows(table, metric)[slot]
+        return predicted, self.name_index.names[rows], self.name_index.hex_codes[rows]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile the KNN color snapping table for a c.csv palette.")
+    parser.add_argument("csv", help="color palette in the c.csv layout")
+    parser.add_argument("--cache-dir", help=f"output directory (default {lut.DEFAULT_CACHE_DIR})")
+    parser.add_argument("--neighbors", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    csv = pd.read_csv(args.csv, names=CSV_COLUMNS, header=None)
+    rgb = csv[["R", "G", "B"]].values
+    snapper = ColorSnapper(rgb, n_neighbors=args.neighbors, cache_dir=args.cache_dir)
+    if snapper.compiled:
+        print(f"Already built: {snapper.slots_path}")
+        return
+    snapper.build()
+    print(f"Built {snapper.slots_path}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
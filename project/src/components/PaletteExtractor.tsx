@@ -6,6 +6,14 @@ type ColorInfo = {
   proportion: number;
 };
 
+type PaletteSession = {
+  session_id: string;
+  width: number;
+  height: number;
+};
+
+const API_BASE_URL = "http://localhost:5003";
+
 export default function PaletteExtractor() {
   const canvasRef = useRef<HTMLCanvasElement | null>(null);
   const [image, setImage] = useState<string | null>(null);
@@ -18,6 +26,19 @@ export default function PaletteExtractor() {
   } | null>(null);
   const [drawing, setDrawing] = useState(false);
   const [colors, setColors] = useState<ColorInfo[]>([]);
+  const [sessionId, setSessionId] = useState<string | null>(null);
+
+  // Upload the image once; later crops only send the rectangle
+  const createSession = async (file: Blob) => {
+    const formData = new FormData();
+    formData.append("image", file);
+    const res = await axios.post<PaletteSession>(
+      `${API_BASE_URL}/palette_session`,
+      formData
+    );
+    setSessionId(res.data.session_id);
+    return res.data.session_id;
+  };
 
   const handleImageUpload = (e: React.ChangeEvent<HTMLInputElement>) => {
     const file = e.target.files?.[0];
@@ -27,6 +48,10 @@ export default function PaletteExtractor() {
     setImage(url);
     setSelection(null);
     setColors([]);
+    setSessionId(null);
+    createSession(file).catch((err) =>
+      console.error("Failed to create palette session", err)
+    );
   };
 
   const startDraw = (e: React.MouseEvent) => {
@@ -66,18 +91,37 @@ export default function PaletteExtractor() {
       return;
     }
 
-    const formData = new FormData();
-    formData.append("image", fileBlob);
-    formData.append("x", Math.round(selection.x).toString());
-    formData.append("y", Math.round(selection.y).toString());
-    formData.append("width", Math.round(selection.width).toString());
-    formData.append("height", Math.round(selection.height).toString());
-
-    axios
-      .post<ColorInfo[]>("http://localhost:5003/extract_palette", formData)
+    const region = {
+      x: Math.round(selection.x),
+      y: Math.round(selection.y),
+      width: Math.round(selection.width),
+      height: Math.round(selection.height),
+    };
+
+    const extract = (id: string) =>
+      axios.post<ColorInfo[]>(
+        `${API_BASE_URL}/palette_session/${id}/extract`,
+        region
+      );
+
+    const run = async () => {
+      const id = sessionId ?? (await createSession(fileBlob));
+      try {
+        return await extract(id);
+      } catch (err) {
+        // Sessions expire on the server; upload again and retry once
+        if (axios.isAxiosError(err) && err.response?.status === 404) {
+          return extract(await createSession(fileBlob));
+        }
+        throw err;
+      }
+    };
+
+    run()
       .then((res) => {
         setColors(res.data);
-      });
+      })
+      .catch((err) => console.error("Failed to extract palette", err));
   };
 
   useEffect(() => {
@@ -3,9 +3,19 @@ from flask_cors import CORS
 import cv2
 import numpy as np
 import pandas as pd
-from sklearn.neighbors import KNeighborsRegressor
 from datetime import datetime
+import json
 import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from colorkit.names import METRICS, ColorNameIndex
+from colorkit.segment import label_frame, summarize_labels
+from colorkit.snap import ColorSnapper
+from frame_source import FrameGrabber, open_capture
+from mjpeg import MjpegBroadcaster
 
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*", "methods": ["GET", "POST", "OPTIONS"], "allow_headers": ["Content-Type"]}})
@@ -25,63 +35,87 @@ if not os.path.exists(color_csv_path):
 else:
     csv = pd.read_csv(color_csv_path, names=index, header=None)
 
-X = csv[["R", "G", "B"]]
-y = csv[["R", "G", "B"]]
-
-# Train KNN model
-knn_model = KNeighborsRegressor(n_neighbors=3)
-knn_model.fit(X, y)
-
-# Camera state
-video_capture = None
-camera_running = False
-
-def get_closest_color_name(R, G, B):
-    minimum = float('inf')
-    cname = ""
-    hex_code = ""
-    for i in range(len(csv)):
-        d = abs(R - int(csv.loc[i, "R"])) + abs(G - int(csv.loc[i, "G"])) + abs(B - int(csv.loc[i, "B"]))
-        if d < minimum:
-            minimum = d
-            cname = csv.loc[i, "color_name"]
-            hex_code = csv.loc[i, "hex"]
-    return cname, hex_code
+color_index = ColorNameIndex.from_dataframe(csv)
+# Setting COLOR_LUT_DIR also answers name lookups from a table, see colorkit.lut
+if os.environ.get('COLOR_LUT_DIR'):
+    color_index.use_lut()
+
+# KNN(3) color cleanup followed by naming, see colorkit.snap. Serves from
+# the compiled 2**24 entry table when `python -m colorkit.snap c.csv` has
+# been run; until then it calls the model and, unless COLOR_SNAP_BUILD=0,
+# compiles the table on a background thread.
+color_snapper = ColorSnapper(
+    csv[["R", "G", "B"]].values, n_neighbors=3,
+    name_index=color_index,
+)
+if not color_snapper.compiled and os.environ.get('COLOR_SNAP_BUILD', '1') != '0':
+    color_snapper.build_in_background()
+
+# Camera state: a single background thread owns the device and publishes
+# frames into a small ring buffer that every reader shares.
+# CAMERA_SOURCE may be a camera index, a video file path or "synthetic".
+camera_source = os.environ.get('CAMERA_SOURCE', '0')
+frame_grabber = FrameGrabber(lambda: open_capture(camera_source, 640, 480))
+
+# /video_feed viewers all share one JPEG encode per frame
+mjpeg_broadcaster = MjpegBroadcaster(
+    frame_grabber,
+    quality=int(os.environ.get('MJPEG_QUALITY', 80)),
+    max_width=int(os.environ.get('MJPEG_MAX_WIDTH', 0)) or None,
+    fps=float(os.environ.get('MJPEG_FPS', 0)),
+)
+
+# Full-frame segmentation always goes through the lookup table
+segmentation_lock = threading.Lock()
+
+# Naming metric used when a request does not pick one, see colorkit.names
+DEFAULT_NAME_METRIC = os.environ.get('NAME_METRIC', 'manhattan')
+
+def snap_color(R, G, B, metric=DEFAULT_NAME_METRIC):
+    """Return (predicted_rgb, color_name, hex) for one pixel."""
+    return color_snapper.snap(np.array([R, G, B]), metric)
+
+def ensure_segmentation_lut():
+    with segmentation_lock:
+        if not color_index.has_lut():
+            color_index.use_lut()
+
+def segment_frame(frame, block, include_labels=True):
+    labels = label_frame(color_index, frame.image, block=block)
+    result = summarize_labels(color_index, labels, block=block)
+    if not include_labels:
+        del result['labels']
+    result['timestamp'] = datetime.fromtimestamp(frame.timestamp).strftime('%Y-%m-%d %H:%M:%S')
+    return result
+
+def parse_segmentation_args():
+    block = max(1, int(request.args.get('block', 1)))
+    include_labels = request.args.get('labels', '1') not in ('0', 'false')
+    return block, include_labels
 
 def initialize_camera():
-    global video_capture, camera_running
-    if not camera_running:
-        video_capture = cv2.VideoCapture(0, cv2.CAP_DSHOW)
-        video_capture.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        video_capture.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        if not video_capture.isOpened():
-            raise RuntimeError("Could not start camera")
-        camera_running = True
-    return video_capture
+    return frame_grabber.start()
 
 def release_camera():
-    global video_capture, camera_running
-    if video_capture is not None and video_capture.isOpened():
-        video_capture.release()
+    frame_grabber.stop()
     cv2.destroyAllWindows()
     cv2.waitKey(1)
-    video_capture = None
-    camera_running = False
+
+def get_latest_frame(timeout=2.0):
+    initialize_camera()
+    frame = frame_grabber.latest() or frame_grabber.wait_for_frame(0, timeout)
+    if frame is None:
+        raise RuntimeError(frame_grabber.error or "Failed to capture frame")
+    return frame
 
 def gen_frames():
-    global video_capture, camera_running
     try:
         initialize_camera()
-        while camera_running:
-            success, frame = video_capture.read()
-            if not success:
-                print("Failed to capture frame")
-                break
-            else:
-                ret, buffer = cv2.imencode('.jpg', frame)
-                frame = buffer.tobytes()
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n\r\n')
+        for jpeg in mjpeg_broadcaster.stream():
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n\r\n')
+        if frame_grabber.error:
+            print(frame_grabber.error)
     except Exception as e:
         print(f"Error in gen_frames: {e}")
         yield (b'--frame\r\n'
@@ -109,28 +143,27 @@ def live_color_data():
 
             x = int(data.get('x', 0))
             y = int(data.get('y', 0))
+            metric = data.get('metric', DEFAULT_NAME_METRIC)
+            if metric not in METRICS:
+                return jsonify({'error': f"Unknown metric '{metric}', expected one of {list(METRICS)}"}), 400
 
-            cam = initialize_camera()
-            success, frame = cam.read()
-            if not success:
-                return jsonify({'error': 'Failed to capture frame'}), 500
+            try:
+                frame = get_latest_frame().image
+            except RuntimeError as e:
+                return jsonify({'error': str(e)}), 500
 
             height, width = frame.shape[:2]
             if not (0 <= x < width) or not (0 <= y < height):
                 return jsonify({'error': f'Coordinates ({x}, {y}) are out of bounds'}), 400
 
             b, g, r = frame[y, x]
-            input_rgb = np.array([[r, g, b]])
-
-            predicted_rgb = knn_model.predict(input_rgb).astype(int)[0]
-            r_pred, g_pred, b_pred = predicted_rgb
-
-            color_name, hex_code = get_closest_color_name(r_pred, g_pred, b_pred)
+            (r_pred, g_pred, b_pred), color_name, hex_code = snap_color(r, g, b, metric)
 
             result = {
                 'name': color_name,
                 'hex': hex_code,
                 'rgb': {'r': int(r_pred), 'g': int(g_pred), 'b': int(b_pred)},
+                'metric': metric,
                 'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             }
 
@@ -141,6 +174,50 @@ def live_color_data():
 
     return jsonify({'error': 'Method not allowed'}), 405
 
+@app.route('/frame_segmentation', methods=['GET'])
+def frame_segmentation():
+    try:
+        block, include_labels = parse_segmentation_args()
+        ensure_segmentation_lut()
+        return jsonify(segment_frame(get_latest_frame(), block, include_labels))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error in frame_segmentation: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/segmentation_stream')
+def segmentation_stream():
+    # Server-sent events, one segmentation summary per captured frame
+    try:
+        block, include_labels = parse_segmentation_args()
+        max_fps = float(request.args.get('fps', 0))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    def generate():
+        ensure_segmentation_lut()
+        min_interval = 1.0 / max_fps if max_fps > 0 else 0
+        last_seq = 0
+        try:
+            initialize_camera()
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+            return
+        while frame_grabber.running:
+            started = time.monotonic()
+            frame = frame_grabber.wait_for_frame(last_seq)
+            if frame is None:
+                continue
+            last_seq = frame.seq
+            yield f"data: {json.dumps(segment_frame(frame, block, include_labels))}\n\n"
+            remaining = min_interval - (time.monotonic() - started)
+            if remaining > 0:
+                time.sleep(remaining)
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache'})
+
 @app.route('/setup', methods=['GET', 'POST', 'OPTIONS'])
 def setup():
     if request.method == 'OPTIONS':
@@ -165,7 +242,25 @@ def teardown():
 
 @app.route('/camera_status', methods=['GET'])
 def camera_status():
-    return jsonify({'camera_running': camera_running})
+    return jsonify({'camera_running': frame_grabber.running,
+                    'video_feed': mjpeg_broadcaster.stats()})
+
+@app.route('/video_feed/settings', methods=['POST', 'OPTIONS'])
+def video_feed_settings():
+    if request.method == 'OPTIONS':
+        response = app.make_default_options_response()
+        return response
+    data = request.get_json(silent=True) or {}
+    try:
+        # configure() rejects out-of-range values with a ValueError
+        mjpeg_broadcaster.configure(
+            quality=int(data['quality']) if data.get('quality') is not None else None,
+            max_width=int(data['max_width']) if data.get('max_width') is not None else None,
+            fps=float(data['fps']) if data.get('fps') is not None else None,
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(mjpeg_broadcaster.stats())
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -0,0 +1,169 @@
+import collections
+import threading
+import time
+
+import cv2
+import numpy as np
+
+Frame = collections.namedtuple("Frame", ["seq", "timestamp", "image"])
+
+
+class FrameGrabber:
+    """Reads a VideoCapture on one background thread.
+
+    Captured frames go into a small ring buffer of timestamped frames. Readers
+    take the latest one (or wait for the next) without touching the device,
+    so any number of stream clients and click handlers can share one camera.
+
+    `capture_factory` is any zero-argument callable returning an object with
+    the VideoCapture read()/release()/isOpened() methods, which lets tests and
+    demos run against a video file or SyntheticCapture.
+
+    The grabber thread owns its capture and releases it on the way out, so
+    the device is never released while a read() is still in progress.
+    """
+
+    def __init__(self, capture_factory, buffer_size=4, read_failures=30):
+        self.capture_factory = capture_factory
+        self.buffer = collections.deque(maxlen=buffer_size)
+        self.read_failures = read_failures
+        self.error = None
+        self._capture = None
+        self._thread = None
+        self._running = False
+        self._seq = 0
+        self._cond = threading.Condition()
+
+    @property
+    def running(self):
+        return self._running
+
+    def start(self, timeout=2.0):
+        with self._cond:
+            if self._running:
+                return self
+            previous = self._thread
+        if previous is not None and previous is not threading.current_thread():
+            # A stopped thread may still be inside read(); wait for it to
+            # release the device rather than run two readers on it
+            previous.join(timeout)
+        with self._cond:
+            if self._running:
+                return self
+            if self._thread is not None:
+                raise RuntimeError("Camera is still shutting down")
+            capture = self.capture_factory()
+            if not capture.isOpened():
+                capture.release()
+                raise RuntimeError("Could not start camera")
+            self._capture = capture
+            self.error = None
+            self._running = True
+            self._thread = threading.Thread(target=self._run, args=(capture,), name="frame-grabber", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        with self._cond:
+            self._running = False
+            thread = self._thread
+            self._cond.notify_all()
+        if thread is not None and thread is not threading.current_thread():
+            # If this times out the thread is still reading; it releases the
+            # capture itself once read() returns
+            thread.join(timeout)
+        with self._cond:
+            self.buffer.clear()
+
+    def _run(self, capture):
+        failures = 0
+        try:
+            while self._running:
+                success, image = capture.read()
+                if not success:
+                    failures += 1
+                    if failures >= self.read_failures:
+                        self.error = "Failed to capture frame"
+                        break
+                    time.sleep(0.01)
+                    continue
+                failures = 0
+                with self._cond:
+                    self._seq += 1
+                    self.buffer.append(Frame(self._seq, time.time(), image))
+                    self._cond.notify_all()
+        finally:
+            capture.release()
+            with self._cond:
+                if self._thread is threading.current_thread():
+                    self._thread = None
+                    self._capture = None
+                    self._running = False
+                self._cond.notify_all()
+
+    def latest(self):
+        """Most recent frame, or None before the first one arrives."""
+        with self._cond:
+            return self.buffer[-1] if self.buffer else None
+
+    def wait_for_frame(self, after_seq=0, timeout=1.0):
+        """Block until a frame newer than `after_seq` exists and return it.
+
+        Returns None on timeout or once the grabber has stopped.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not self.buffer or self.buffer[-1].seq <= after_seq:
+                remaining = deadline - time.monotonic()
+                if not self._running or remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            return self.buffer[-1]
+
+    def snapshot(self):
+        """All buffered frames, oldest first."""
+        with self._cond:
+            return list(self.buffer)
+
+
+class SyntheticCapture:
+    """Minimal VideoCapture stand-in producing moving color bars."""
+
+    def __init__(self, width=640, height=480, fps=30):
+        self.width = width
+        self.height = height
+        self.interval = 1.0 / fps if fps else 0
+        self.count = 0
+        self.opened = True
+
+    def isOpened(self):
+        return self.opened
+
+    def read(self):
+        if not self.opened:
+            return False, None
+        if self.interval:
+            time.sleep(self.interval)
+        hue = (np.arange(self.width, dtype=np.int32) + self.count * 4) % 180
+        hsv = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        hsv[..., 0] = hue.astype(np.uint8)
+        hsv[..., 1:] = 255
+        self.count += 1
+        return True, cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
+
+    def release(self):
+        self.opened = False
+
+
+def open_capture(source, width=640, height=480):
+    """Open a camera index, a video file path, or "synthetic"."""
+    if source == "synthetic":
+        return SyntheticCapture(width, height)
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+    if isinstance(source, int):
+        capture = cv2.VideoCapture(source, cv2.CAP_DSHOW)
+        capture.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        capture.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        return capture
+    return cv2.VideoCapture(source)
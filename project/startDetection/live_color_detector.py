@@ -1,10 +1,16 @@
+import os
+import sys
+
 import cv2
 import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
-from sklearn.neighbors import KNeighborsRegressor, NearestNeighbors
+from sklearn.neighbors import NearestNeighbors
 from sklearn.metrics import mean_squared_error
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from colorkit.snap import ColorSnapper
+
 # ----------- Load and Train Models -----------
 
 # Load color dataset (assuming no headers in the CSV)
@@ -20,11 +26,13 @@ hex_codes = df["hex"].values
 # Train-test split (for evaluation only)
 X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
-# Train KNN regressor
-knn_model = KNeighborsRegressor(n_neighbors=3)
-knn_model.fit(X_train, y_train)
+# KNN(3) regressor on the training split. Answers from the model itself
+# until its 2**24 entry lookup table has been compiled in the background.
+color_snapper = ColorSnapper(X_train.values, y_train.values, n_neighbors=3)
+if not color_snapper.compiled:
+    color_snapper.build_in_background()
 
-# Train nearest neighbor model to find closest color name
+# Nearest neighbor model to find the closest color name
 nn_model = NearestNeighbors(n_neighbors=1)
 nn_model.fit(X)
 
@@ -36,14 +44,12 @@ def get_color_name(event, x, y, flags, param):
     global clicked_info, frame
     if event == cv2.EVENT_LBUTTONDOWN:
         b, g, r = frame[y, x]
-        input_rgb = np.array([[r, g, b]])
-
-        predicted_rgb = knn_model.predict(input_rgb).astype(int)
-        dist, idx = nn_model.kneighbors(predicted_rgb)
+        predicted = color_snapper.predict(np.array([[r, g, b]]))
+        _, row = nn_model.kneighbors(pd.DataFrame(predicted, columns=X.columns))
 
-        name = color_names[idx[0][0]]
-        hexcode = hex_codes[idx[0][0]]
-        clean_rgb = tuple(int(x) for x in predicted_rgb[0])
+        name = color_names[row[0, 0]]
+        hexcode = hex_codes[row[0, 0]]
+        clean_rgb = tuple(int(x) for x in predicted[0])
 
         clicked_info["color"] = clean_rgb
         clicked_info["name"] = name
@@ -0,0 +1,163 @@
+import math
+import threading
+import time
+
+import cv2
+
+
+class MjpegBroadcaster:
+    """Encodes each grabbed frame to JPEG once and fans the bytes out.
+
+    One encoder thread runs while at least one client is subscribed. It
+    publishes only the latest encoded frame, and every client waits for a
+    sequence number newer than the one it last sent. A slow client
+    therefore skips straight to the newest frame instead of building up a
+    queue, and it never holds back the encoder or the other clients.
+    """
+
+    def __init__(self, grabber, quality=80, max_width=None, fps=0):
+        self.grabber = grabber
+        self.quality = 80
+        self.max_width = None
+        self.fps = 0
+        self.configure(quality, max_width or 0, fps)
+        self.frames_encoded = 0
+        self.frames_dropped = 0
+        self.encode_errors = 0
+        self._subscribers = 0
+        self._latest = None  # (seq, jpeg bytes)
+        self._seq = 0
+        self._thread = None
+        self._cond = threading.Condition()
+
+    def configure(self, quality=None, max_width=None, fps=None):
+        """Change encoder settings, picked up on the next frame.
+
+        max_width=0 and fps=0 turn resizing and throttling off. Invalid
+        values raise ValueError and leave every setting unchanged.
+        """
+        if quality is not None and not 1 <= quality <= 100:
+            raise ValueError("quality must be between 1 and 100")
+        if max_width is not None and max_width < 0:
+            raise ValueError("max_width must be 0 (off) or a positive width")
+        if fps is not None and not (math.isfinite(fps) and fps >= 0):
+            raise ValueError("fps must be 0 (off) or a positive rate")
+        if quality is not None:
+            self.quality = quality
+        if max_width is not None:
+            self.max_width = max_width or None
+        if fps is not None:
+            self.fps = fps
+
+    def stats(self):
+        with self._cond:
+            return {
+                'subscribers': self._subscribers,
+                'frames_encoded': self.frames_encoded,
+                'frames_dropped': self.frames_dropped,
+                'encode_errors': self.encode_errors,
+                'quality': self.quality,
+                'max_width': self.max_width,
+                'fps': self.fps,
+            }
+
+    def encode(self, image):
+        if self.max_width and image.shape[1] > self.max_width:
+            height = round(image.shape[0] * self.max_width / image.shape[1])
+            image = cv2.resize(image, (self.max_width, height), interpolation=cv2.INTER_AREA)
+        ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, int(self.quality)])
+        if not ok:
+            raise RuntimeError("JPEG encoding failed")
+        return buffer.tobytes()
+
+    def _run(self):
+        try:
+            self._encode_loop()
+        finally:
+            # Normally _encode_loop clears _thread itself; this covers an
+            # unexpected exit so the next client can start a new encoder
+            with self._cond:
+                if self._thread is threading.current_thread():
+                    self._thread = None
+                self._cond.notify_all()
+
+    def _encode_loop(self):
+        last_frame_seq = 0
+        next_due = 0.0
+        while True:
+            with self._cond:
+                # Decide to stop and give up the thread slot in one lock
+                # hold, so a client subscribing right now starts a new one
+                if self._subscribers == 0 or not self.grabber.running:
+                    if self._thread is threading.current_thread():
+                        self._thread = None
+                    self._cond.notify_all()
+                    return
+            frame = self.grabber.wait_for_frame(last_frame_seq, timeout=0.5)
+            if frame is None:
+                continue
+            last_frame_seq = frame.seq
+
+            if self.fps:
+                now = time.monotonic()
+                if now < next_due:
+                    continue
+                next_due = max(next_due + 1.0 / self.fps, now)
+
+            try:
+                jpeg = self.encode(frame.image)
+            except Exception as e:
+                # A bad frame must not kill the encoder for every client
+                print(f"MJPEG encode failed: {e}")
+                with self._cond:
+                    self.encode_errors += 1
+                continue
+            with self._cond:
+                self._seq += 1
+                self._latest = (self._seq, jpeg)
+                self.frames_encoded += 1
+                self._cond.notify_all()
+
+    def _ensure_encoder_locked(self):
+        if self._thread is None and self._subscribers > 0 and self.grabber.running:
+            self._thread = threading.Thread(target=self._run, name="mjpeg-encoder", daemon=True)
+            self._thread.start()
+
+    def _subscribe(self):
+        with self._cond:
+            self._subscribers += 1
+            self._ensure_encoder_locked()
+
+    def _unsubscribe(self):
+        with self._cond:
+            self._subscribers -= 1
+
+    def _next(self, after_seq, timeout):
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._latest is None or self._latest[0] <= after_seq:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                # The encoder may have stopped between frames; restart it
+                # rather than leave this client without one
+                self._ensure_encoder_locked()
+                self._cond.wait(remaining)
+            seq, jpeg = self._latest
+            if after_seq and seq > after_seq + 1:
+                self.frames_dropped += seq - after_seq - 1
+            return seq, jpeg
+
+    def stream(self):
+        """Generator of JPEG bytes for one client, newest frame each time."""
+        self._subscribe()
+        try:
+            last_seq = 0
+            while self.grabber.running:
+                item = self._next(last_seq, timeout=1.0)
+                if item is None:
+                    continue
+                last_seq, jpeg = item
+                yield jpeg
+        finally:
+            self._unsubscribe()
@@ -3,6 +3,10 @@ import pandas as pd
 import os
 import tkinter as tk
 from tkinter import filedialog
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from colorkit.names import ColorNameIndex
 
 # Create a root window but hide it
 root = tk.Tk()
@@ -49,17 +53,11 @@ r = g = b = x_pos = y_pos = 0
 # Read the CSV file with color data
 index = ["color", "color_name", "hex", "R", "G", "B"]
 csv = pd.read_csv(csv_path, names=index, header=None)
+color_index = ColorNameIndex.from_dataframe(csv)
 
 # Function to get color name from RGB values
 def get_color_name(R, G, B):
-    minimum = 10000
-    cname = ""
-    for i in range(len(csv)):
-        d = abs(R - int(csv.loc[i, "R"])) + abs(G - int(csv.loc[i, "G"])) + abs(B - int(csv.loc[i, "B"]))
-        if d < minimum:
-            minimum = d
-            cname = csv.loc[i, "color_name"]
-    return cname
+    return color_index.nearest(R, G, B)[0]
 
 # Mouse callback function
 def draw_function(event, x, y, flags, param):
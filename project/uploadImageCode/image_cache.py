@@ -0,0 +1,185 @@
+import collections
+import hashlib
+import os
+import sys
+import threading
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from colorkit.atomic import atomic_write
+
+
+class DecodedImageCache:
+    """In-process LRU of decoded images, bounded by total array bytes.
+
+    Cached arrays are marked read-only, so a caller that wants to draw on
+    an image has to copy it first. Any other value with an `nbytes`
+    attribute, such as an IntegralHistogram, can be cached the same way.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            img = self._items.get(key)
+            if img is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return img
+
+    def put(self, key, img):
+        if img.nbytes > self.max_bytes:
+            return img
+        if isinstance(img, np.ndarray):
+            img.setflags(write=False)
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old.nbytes
+            self._items[key] = img
+            self.current_bytes += img.nbytes
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+                self.evictions += 1
+        return img
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': 'memory',
+                'entries': len(self._items),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+class SharedMemoryImageCache:
+    """Decoded-image cache shared by every worker process on a host.
+
+    Each image is stored as a .npy file in `directory`, which should be on a
+    tmpfs such as /dev/shm. Files are written to a temp name and renamed into
+    place, then memory-mapped read-only on lookup, so all workers read the
+    same physical pages. Recency is tracked with file mtimes and the
+    directory is trimmed back to `max_bytes` after each insert. Hit, miss and
+    eviction counters are per process.
+    """
+
+    def __init__(self, max_bytes, directory):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        name = hashlib.sha1(str(key).encode()).hexdigest()
+        return os.path.join(self.directory, name + '.npy')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            img = np.load(path, mmap_mode='r')
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            # Missing, or evicted by another worker between open and load
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return img
+
+    def put(self, key, img):
+        if img.nbytes > self.max_bytes:
+            return img
+        with atomic_write(self._path(key)) as f:
+            np.save(f, np.ascontiguousarray(img))
+        self._trim()
+        img.setflags(write=False)
+        return img
+
+    def _entries(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith('.npy'):
+                continue
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+
+    def _trim(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Another worker got there first
+                continue
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    def stats(self):
+        entries = self._entries()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': 'shared',
+                'entries': len(entries),
+                'bytes': sum(size for _, size, _ in entries),
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+def create_cache(max_bytes, shared_dir=None):
+    if shared_dir:
+        return SharedMemoryImageCache(max_bytes, shared_dir)
+    return DecodedImageCache(max_bytes)
+
+
+def load_decoded(cache, store, image_id):
+    """Fetch and decode a stored image through `cache`.
+
+    Returns (found, img). A hit skips the store and the decode entirely.
+    img is None when the stored bytes do not decode.
+    """
+    img = cache.get(image_id)
+    if img is not None:
+        return True, img
+    stored = store.get(image_id)
+    if stored is None:
+        return False, None
+    with stored:
+        img = cv2.imdecode(np.frombuffer(stored.data, np.uint8), cv2.IMREAD_COLOR)
+    if img is not None:
+        img = cache.put(image_id, img)
+    return True, img
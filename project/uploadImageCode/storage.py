@@ -0,0 +1,188 @@
+import collections
+import hashlib
+import io
+import json
+import mmap
+import os
+import re
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from colorkit.atomic import write_atomic
+
+class StoredImage(collections.namedtuple("StoredImage", ["image_id", "filename", "data", "sha256", "timestamp"])):
+    """An encoded upload. `data` is any buffer np.frombuffer() accepts.
+
+    The local store hands out an mmap of the blob, so close the image (or
+    use it as a context manager) once done with `data`. Arrays made with
+    np.frombuffer() must be gone by then.
+    """
+    __slots__ = ()
+
+    def reader(self):
+        """Seekable file object over `data`. Closing it closes the image."""
+        if isinstance(self.data, mmap.mmap):
+            self.data.seek(0)
+            return self.data
+        return io.BytesIO(self.data)
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+# uuid4 strings, plus anything else made only of safe path characters
+_VALID_ID = re.compile(r'^[A-Za-z0-9_-]{1,128}$')
+
+
+class ImageStore:
+    """Where encoded uploads live. Backends implement put() and get()."""
+
+    def put(self, image_id, data, filename):
+        raise NotImplementedError
+
+    def get(self, image_id):
+        """StoredImage for `image_id`, or None if it does not exist.
+
+        The caller closes the returned image.
+        """
+        raise NotImplementedError
+
+    def put_analysis(self, image_id, analysis):
+        """Store the JSON-serializable video analysis for an upload."""
+        raise NotImplementedError
+
+    def get_analysis(self, image_id):
+        raise NotImplementedError
+
+
+class MongoImageStore(ImageStore):
+    """Images as Binary blobs in MongoDB, the original layout."""
+
+    def __init__(self, uri, db_name='color_detector'):
+        from pymongo import MongoClient
+
+        self.client = MongoClient(uri)
+        self.db = self.client[db_name]
+        self.images = self.db['images']
+        self.analyses = self.db['video_analyses']
+
+    def put(self, image_id, data, filename):
+        from bson.binary import Binary
+
+        self.images.insert_one({
+            '_id': image_id,
+            'filename': filename,
+            'image': Binary(data),
+            'sha256': hashlib.sha256(data).hexdigest(),
+            'processed': False,
+            'timestamp': datetime.now()
+        })
+
+    def get(self, image_id):
+        doc = self.images.find_one({'_id': image_id})
+        if not doc:
+            return None
+        data = bytes(doc['image'])
+        # Documents written before the hash was stored
+        sha = doc.get('sha256') or hashlib.sha256(data).hexdigest()
+        return StoredImage(doc['_id'], doc.get('filename'), data, sha, doc.get('timestamp'))
+
+    def put_analysis(self, image_id, analysis):
+        self.analyses.replace_one({'_id': image_id}, dict(analysis, _id=image_id), upsert=True)
+
+    def get_analysis(self, image_id):
+        doc = self.analyses.find_one({'_id': image_id})
+        if doc:
+            doc.pop('_id')
+        return doc
+
+
+class LocalImageStore(ImageStore):
+    """Content-addressed store on the local filesystem.
+
+    Blobs live under blobs/<aa>/<sha256> so identical uploads share one
+    file, and a small JSON record per image_id points at its blob. Reads
+    hand back a read-only mmap of the blob instead of copying it, which
+    stays open until the StoredImage is closed.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(os.path.join(root, 'blobs'), exist_ok=True)
+        os.makedirs(os.path.join(root, 'images'), exist_ok=True)
+        os.makedirs(os.path.join(root, 'analyses'), exist_ok=True)
+
+    def _blob_path(self, sha):
+        return os.path.join(self.root, 'blobs', sha[:2], sha)
+
+    def _record_path(self, image_id, kind='images'):
+        if not _VALID_ID.match(image_id):
+            return None
+        return os.path.join(self.root, kind, image_id + '.json')
+
+    def put(self, image_id, data, filename):
+        record_path = self._record_path(image_id)
+        if record_path is None:
+            raise ValueError(f"Invalid image id '{image_id}'")
+
+        sha = hashlib.sha256(data).hexdigest()
+        blob_path = self._blob_path(sha)
+        if not os.path.exists(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            write_atomic(blob_path, data)
+
+        record = {
+            'filename': filename,
+            'sha256': sha,
+            'processed': False,
+            'timestamp': datetime.now().isoformat(),
+        }
+        write_atomic(record_path, json.dumps(record).encode())
+
+    def get(self, image_id):
+        record_path = self._record_path(image_id)
+        if record_path is None:
+            return None
+        try:
+            with open(record_path) as f:
+                record = json.load(f)
+            with open(self._blob_path(record['sha256']), 'rb') as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return None
+        return StoredImage(image_id, record.get('filename'), data, record['sha256'],
+                           datetime.fromisoformat(record['timestamp']))
+
+    def put_analysis(self, image_id, analysis):
+        path = self._record_path(image_id, 'analyses')
+        if path is None:
+            raise ValueError(f"Invalid image id '{image_id}'")
+        write_atomic(path, json.dumps(analysis).encode())
+
+    def get_analysis(self, image_id):
+        path = self._record_path(image_id, 'analyses')
+        if path is None:
+            return None
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+
+def create_store(backend, local_dir=None, mongo_uri=None):
+    if backend == 'local':
+        return LocalImageStore(local_dir)
+    if backend == 'mongo':
+        if not mongo_uri:
+            raise ValueError("IMAGE_STORE=mongo requires MONGO_URI to be set "
+                             "(or use IMAGE_STORE=local)")
+        return MongoImageStore(mongo_uri)
+    raise ValueError(f"Unknown image store '{backend}', expected 'local' or 'mongo'")
@@ -0,0 +1,144 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from colorkit.integral import IntegralHistogram
+from image_cache import DecodedImageCache, SharedMemoryImageCache, create_cache, load_decoded
+from storage import create_store
+
+
+def make_image(value, size=16):
+    return np.full((size, size, 3), value, dtype=np.uint8)
+
+
+@pytest.fixture
+def mongo_store(monkeypatch):
+    mongomock = pytest.importorskip('mongomock')
+    monkeypatch.setattr('pymongo.MongoClient', lambda uri: mongomock.MongoClient())
+    return create_store('mongo', mongo_uri='mongodb://localhost')
+
+
+@pytest.fixture(params=['memory', 'shared'])
+def cache_factory(request, tmp_path):
+    if request.param == 'memory':
+        return lambda max_bytes: create_cache(max_bytes)
+    return lambda max_bytes: create_cache(max_bytes, str(tmp_path / 'shm'))
+
+
+def test_create_cache_backend(tmp_path):
+    assert isinstance(create_cache(1024), DecodedImageCache)
+    assert isinstance(create_cache(1024, str(tmp_path)), SharedMemoryImageCache)
+
+
+def test_read_through_mongo(mongo_store, cache_factory, monkeypatch):
+    ok, png = cv2.imencode('.png', make_image(7))
+    mongo_store.put('a', png.tobytes(), 'a.png')
+    cache = cache_factory(1 << 20)
+
+    found, first = load_decoded(cache, mongo_store, 'a')
+    # A hit must not go back to the database or decode again
+    monkeypatch.setattr(mongo_store, 'get', lambda image_id: pytest.fail('store read on a cache hit'))
+    monkeypatch.setattr(cv2, 'imdecode', lambda *args: pytest.fail('decode on a cache hit'))
+    found_again, second = load_decoded(cache, mongo_store, 'a')
+
+    assert found and found_again
+    assert np.array_equal(first, second)
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions']) == (1, 1, 0)
+    assert stats['entries'] == 1
+    assert stats['hit_rate'] == 0.5
+
+
+def test_read_through_missing_and_undecodable(tmp_path, cache_factory):
+    store = create_store('local', local_dir=str(tmp_path / 'store'))
+    store.put('junk', b'not an image', 'junk.png')
+    cache = cache_factory(1 << 20)
+
+    assert load_decoded(cache, store, 'nope') == (False, None)
+    assert load_decoded(cache, store, 'junk') == (True, None)
+    assert cache.stats()['entries'] == 0
+
+
+def test_local_store_mapping_is_closed(tmp_path):
+    store = create_store('local', local_dir=str(tmp_path / 'store'))
+    store.put('a', b'0123456789', 'a.jpg')
+
+    with store.get('a') as stored:
+        assert stored.data[2:5] == b'234'
+    assert stored.data.closed
+
+    stored = store.get('a')
+    reader = stored.reader()
+    reader.seek(4)
+    assert reader.read(3) == b'456'
+    reader.close()
+    assert stored.data.closed
+
+
+def test_eviction_is_bounded_by_bytes(cache_factory):
+    img_bytes = make_image(0).nbytes
+    # Room for two images (plus the .npy header on the shared backend)
+    cache = cache_factory(2 * img_bytes + 256)
+    cache.put('a', make_image(1))
+    cache.put('b', make_image(2))
+    if isinstance(cache, SharedMemoryImageCache):
+        # Recency comes from mtimes; keep 'a' clearly older than 'b'
+        os.utime(cache._path('a'), (1, 1))
+        os.utime(cache._path('b'), (2, 2))
+    cache.put('c', make_image(3))
+
+    stats = cache.stats()
+    assert stats['evictions'] == 1
+    assert stats['entries'] == 2
+    assert stats['bytes'] <= stats['max_bytes']
+    assert cache.get('a') is None
+    assert cache.get('b')[0, 0, 0] == 2
+    assert cache.get('c')[0, 0, 0] == 3
+
+
+def test_memory_cache_bounds_region_indexes_by_bytes():
+    indexes = [IntegralHistogram(make_image(v, 64), bits='compact') for v in range(3)]
+    cache = DecodedImageCache(2 * indexes[0].nbytes)
+    for key, region_index in enumerate(indexes):
+        cache.put(key, region_index)
+
+    assert cache.get(0) is None
+    assert cache.get(2) is indexes[2]
+    assert cache.stats()['bytes'] == 2 * indexes[0].nbytes
+
+
+def test_oversized_image_is_not_cached(cache_factory):
+    cache = cache_factory(64)
+    img = make_image(5)
+    assert cache.put('big', img) is img
+    assert cache.get('big') is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_cached_images_are_read_only(cache_factory):
+    cache = cache_factory(1 << 20)
+    cache.put('a', make_image(9))
+    img = cache.get('a')
+    with pytest.raises(ValueError):
+        img[0, 0, 0] = 0
+
+
+def test_shared_cache_maps_files_read_only(tmp_path):
+    directory = str(tmp_path / 'shm')
+    writer = SharedMemoryImageCache(1 << 20, directory)
+    reader = SharedMemoryImageCache(1 << 20, directory)
+    writer.put('a', make_image(4))
+
+    # A second process sees the same file through a read-only mapping
+    img = reader.get('a')
+    assert isinstance(img, np.memmap)
+    assert img.mode == 'r'
+    assert not img.flags.writeable
+    assert img[0, 0, 0] == 4
+    assert reader.stats()['hits'] == 1
+    assert writer.stats()['hits'] == 0
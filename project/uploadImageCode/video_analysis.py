@@ -0,0 +1,141 @@
+import bisect
+import os
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from colorkit.palette import to_hex, unique_colors
+
+# Upload streaming chunk size
+CHUNK_SIZE = 1024 * 1024
+
+# Frames are shrunk to this width before their colors are counted
+ANALYSIS_WIDTH = 160
+
+
+def save_stream_to_temp(stream, suffix):
+    """Copy an upload stream to a temp file in chunks and return its path."""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as f:
+        shutil.copyfileobj(stream, f, CHUNK_SIZE)
+        return f.name
+
+
+def frame_color_summary(img, color_index, n_colors=5, bits=4):
+    """Dominant colors and color-name histogram of one BGR frame.
+
+    Pixels are binned with colorkit.palette.unique_colors at `bits` per
+    channel, the same histogram the palette extractor clusters. Only the
+    occupied bins are then named, each by its mean color and weighted by
+    its count, which keeps the name lookup small whatever the frame size.
+    """
+    height, width = img.shape[:2]
+    if width > ANALYSIS_WIDTH:
+        size = (ANALYSIS_WIDTH, max(1, round(height * ANALYSIS_WIDTH / width)))
+        img = cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+
+    colors, weights = unique_colors(img.reshape(-1, 3)[:, ::-1], bits)
+    colors = np.round(colors).astype(int)
+    total = weights.sum()
+
+    top = np.argsort(-weights, kind='stable')[:n_colors]
+    dominant = [{
+        'hex': to_hex(colors[i]),
+        'fraction': float(weights[i] / total),
+    } for i in top]
+
+    name_idx = color_index.nearest_index(colors)
+    name_counts = np.bincount(name_idx, weights=weights, minlength=len(color_index))
+    named = np.flatnonzero(name_counts)
+    order = named[np.argsort(-name_counts[named], kind='stable')]
+    names = [{
+        'name': color_index.names[i],
+        'hex': color_index.hex_codes[i],
+        'fraction': float(name_counts[i] / total),
+    } for i in order]
+
+    return {'dominant_colors': dominant, 'color_names': names}
+
+
+def _analyze_range(path, start, stop, stride, fps, color_index):
+    # Each worker has its own capture, seeks to its range and only decodes
+    # (retrieve) the sampled frames; the rest are just grabbed.
+    cap = cv2.VideoCapture(path)
+    frames = []
+    try:
+        if start:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        for index in range(start, stop):
+            if not cap.grab():
+                break
+            if index % stride:
+                continue
+            ok, img = cap.retrieve()
+            if not ok:
+                break
+            summary = frame_color_summary(img, color_index)
+            summary['index'] = index
+            summary['timestamp'] = index / fps if fps else 0.0
+            frames.append(summary)
+    finally:
+        cap.release()
+    return frames
+
+
+def analyze_video(path, color_index, stride=15, workers=4):
+    """Per-frame color analysis of every `stride`-th frame of a video file.
+
+    The clip is split into contiguous ranges decoded in parallel. Returns a
+    dict with clip metadata and a timestamp-ordered `frames` list.
+    """
+    stride = max(1, int(stride))
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise ValueError("Could not open video")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    cap.release()
+
+    if frame_count <= 0:
+        # Container does not report a length, read it start to end
+        frames = _analyze_range(path, 0, 1 << 31, stride, fps, color_index)
+    else:
+        # Ranges start on a sampled frame so every worker does useful work
+        per_range = max(stride, -(-frame_count // (workers * 2) // stride) * stride)
+        ranges = [(start, min(start + per_range, frame_count)) for start in range(0, frame_count, per_range)]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            parts = pool.map(lambda r: _analyze_range(path, r[0], r[1], stride, fps, color_index), ranges)
+            frames = [frame for part in parts for frame in part]
+
+    return {
+        'fps': fps,
+        'frame_count': frame_count,
+        'duration': frame_count / fps if fps else None,
+        'stride': stride,
+        'frames': frames,
+    }
+
+
+def frames_in_range(analysis, start=None, end=None):
+    """Sampled frames with start <= timestamp <= end."""
+    frames = analysis['frames']
+    times = [f['timestamp'] for f in frames]
+    lo = bisect.bisect_left(times, start) if start is not None else 0
+    hi = bisect.bisect_right(times, end) if end is not None else len(frames)
+    return frames[lo:hi]
+
+
+def frame_at(analysis, t):
+    """Sampled frame closest to timestamp `t`, or None for an empty analysis."""
+    frames = analysis['frames']
+    if not frames:
+        return None
+    times = [f['timestamp'] for f in frames]
+    i = bisect.bisect_left(times, t)
+    if i == len(frames) or (i > 0 and t - times[i - 1] <= times[i] - t):
+        i -= 1
+    return frames[i]